@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+from pathlib import Path
+
+# === Settings ===
+AI_CACHE_DB = Path(os.environ.get("AI_CACHE_DB", "logs/ai_cache.db"))
+AI_CACHE_TTL = float(os.environ.get("AI_CACHE_TTL_HOURS", "72")) * 3600
+AI_CACHE_MAX_BYTES = int(float(os.environ.get("AI_CACHE_MAX_MB", "50")) * 1024 * 1024)
+AI_CACHE_ENABLED = os.environ.get("AI_CACHE", "true").lower() == "true"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def _connect():
+    AI_CACHE_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(AI_CACHE_DB), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def normalize_prompt(prompt):
+    return " ".join(prompt.split())
+
+def cache_key(provider, model, prompt, params=None):
+    """Content address for a request: provider, model, whitespace-normalized prompt and parameters."""
+    payload = json.dumps([provider, model, normalize_prompt(prompt), params or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _bump(conn, name):
+    conn.execute("INSERT INTO stats (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+                 (name,))
+
+
+# === Lookup & Store ===
+def lookup(requests):
+    """First fresh cached response among requests, as (provider, response), or None.
+
+    requests is a list of (provider, model, prompt, params) tried in order; the
+    whole lookup counts as one hit or one miss. Cache errors are logged, never raised.
+    """
+    if not AI_CACHE_ENABLED or not requests:
+        return None
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            for provider, model, prompt, params in requests:
+                key = cache_key(provider, model, prompt, params)
+                row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] <= AI_CACHE_TTL:
+                    conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    _bump(conn, "hits")
+                    return provider, row[0]
+                if row:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            _bump(conn, "misses")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logging.warning(f"⚠️ AI cache read failed: {e}")
+    return None
+
+def get(provider, model, prompt, params=None):
+    """Cached response for one provider, or None on miss/expiry."""
+    found = lookup([(provider, model, prompt, params)])
+    return found[1] if found else None
+
+def put(provider, model, prompt, response, params=None):
+    if not AI_CACHE_ENABLED:
+        return
+    key = cache_key(provider, model, prompt, params)
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, provider, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, response, len(response.encode()), now, now)
+            )
+            evict(conn)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logging.warning(f"⚠️ AI cache write failed: {e}")
+
+
+# === Eviction & Stats ===
+def evict(conn, max_bytes=AI_CACHE_MAX_BYTES, ttl=AI_CACHE_TTL):
+    """Drop expired entries, then least recently used ones until the cache fits max_bytes."""
+    conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - ttl,))
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    while total > max_bytes:
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 100").fetchall()
+        if not rows:
+            break
+        for key, size in rows:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= max_bytes:
+                break
+
+def stats():
+    try:
+        conn = _connect()
+        try:
+            counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logging.warning(f"⚠️ AI cache stats failed: {e}")
+        return {}
+    return {"hits": counters.get("hits", 0), "misses": counters.get("misses", 0), "entries": entries, "bytes": size}
+
+
+if __name__ == "__main__":
+    print(f"🧠 AI cache: {stats()}")
@@ -1,24 +1,31 @@
 import os
-import requests
+import time
+import asyncio
 import logging
+import threading
+from collections import deque
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+import ai_cache
+import gpt4all_daemon
 
-# Optional Local AI
-try:
-    from gpt4all import GPT4All
-    USE_GPT4ALL = os.environ.get("USE_GPT4ALL", "false").lower() == "true"
-    if USE_GPT4ALL:
-        gpt4all_model = GPT4All("mistral-7b-instruct-v0.1.Q4_0.gguf")
-    else:
-        gpt4all_model = None
-except ImportError:
-    USE_GPT4ALL = False
-    gpt4all_model = None
+# Optional Local AI (served by gpt4all_daemon, which loads the model once for every process)
+USE_GPT4ALL = os.environ.get("USE_GPT4ALL", "false").lower() == "true"
 
 # === API Keys ===
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 HUGGINGFACE_API_KEY = os.environ.get("HUGGINGFACE_API_KEY")
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 
+# === Models ===
+OPENAI_MODEL = "gpt-3.5-turbo"
+GEMINI_MODEL = "gemini-pro"
+HUGGINGFACE_MODEL = "google/flan-t5-base"
+GPT4ALL_MODEL = gpt4all_daemon.GPT4ALL_MODEL
+SYSTEM_PROMPT = "You are a helpful assistant for YouTube video automation."
+GPT4ALL_MAX_TOKENS = 200
+
 HEADERS_OPENAI = {
     "Authorization": f"Bearer {OPENAI_API_KEY}",
     "Content-Type": "application/json"
@@ -33,6 +40,17 @@ HEADERS_GEMINI = {
     "x-goog-api-key": GEMINI_API_KEY
 } if GEMINI_API_KEY else {}
 
+# === Provider Resilience ===
+REQUEST_TIMEOUTS = {"OpenAI": 10, "Gemini": 15, "HuggingFace": 10}
+CIRCUIT_FAILURE_THRESHOLD = 3  # Consecutive failures before a provider is skipped
+CIRCUIT_COOLDOWN = 300  # Seconds a tripped provider stays skipped
+LATENCY_WINDOW = 50
+HEDGED_MODE = os.environ.get("AI_HEDGED", "false").lower() == "true"
+
+# === Batch Limits ===
+PROVIDER_CONCURRENCY = {"OpenAI": 8, "Gemini": 4, "HuggingFace": 4, "GPT4All": 2}  # In-flight calls per provider
+PROVIDER_RPM = {"OpenAI": 500, "Gemini": 60, "HuggingFace": 60}  # Request starts per minute; unset means unlimited
+
 # === Logging ===
 logging.basicConfig(
     filename="logs/ai_helpers_log.txt",
@@ -40,64 +58,246 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-def generate_text(prompt: str, category: str = "general") -> str:
-    """Generate text using the best available AI source."""
 
-    # --- 1. OpenAI ---
-    if OPENAI_API_KEY:
-        try:
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=HEADERS_OPENAI,
-                json={
-                    "model": "gpt-3.5-turbo",
-                    "messages": [
-                        {"role": "system", "content": "You are a helpful assistant for YouTube video automation."},
-                        {"role": "user", "content": prompt}
-                    ]
-                },
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"].strip()
-        except Exception as e:
-            logging.warning(f"OpenAI fallback: {e}")
+# === Sessions & Health ===
+_sessions = {}
+_sessions_lock = threading.Lock()
 
-    # --- 2. Gemini ---
-    if GEMINI_API_KEY:
-        try:
-            gemini_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
-            body = {"contents": [{"parts": [{"text": prompt}]}]}
-            response = requests.post(gemini_url, headers=HEADERS_GEMINI, json=body)
-            response.raise_for_status()
-            content = response.json()
-            return content["candidates"][0]["content"]["parts"][0]["text"].strip()
-        except Exception as e:
-            logging.warning(f"Gemini fallback: {e}")
+def _session(name):
+    """One pooled requests.Session per provider, so keep-alive connections are reused."""
+    with _sessions_lock:
+        if name not in _sessions:
+            _sessions[name] = requests.Session()
+        return _sessions[name]
+
+class ProviderHealth:
+    """Recent latencies plus a consecutive-failure circuit breaker for one provider."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.failures = 0
+        self.open_until = 0.0
+        self.lock = threading.Lock()
+
+    def is_open(self):
+        return time.monotonic() < self.open_until
+
+    def record_success(self, latency):
+        with self.lock:
+            self.latencies.append(latency)
+            self.failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= CIRCUIT_FAILURE_THRESHOLD:
+                self.open_until = time.monotonic() + CIRCUIT_COOLDOWN
+                logging.warning(f"🔌 Circuit open for {self.name} for {CIRCUIT_COOLDOWN}s after {self.failures} failures")
+
+    def p95(self):
+        """95th percentile latency, or the request timeout until enough samples exist."""
+        with self.lock:
+            samples = sorted(self.latencies)
+        if len(samples) < 5:
+            return REQUEST_TIMEOUTS.get(self.name, 10)
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+_health = {}
+
+def provider_health(name):
+    with _sessions_lock:
+        if name not in _health:
+            _health[name] = ProviderHealth(name)
+        return _health[name]
+
+
+# === Providers ===
+def _call_openai(prompt):
+    response = _session("OpenAI").post(
+        "https://api.openai.com/v1/chat/completions",
+        headers=HEADERS_OPENAI,
+        json={
+            "model": OPENAI_MODEL,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ]
+        },
+        timeout=REQUEST_TIMEOUTS["OpenAI"]
+    )
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"].strip()
+
+def _call_gemini(prompt):
+    gemini_url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent"
+    body = {"contents": [{"parts": [{"text": prompt}]}]}
+    response = _session("Gemini").post(gemini_url, headers=HEADERS_GEMINI, json=body, timeout=REQUEST_TIMEOUTS["Gemini"])
+    response.raise_for_status()
+    content = response.json()
+    return content["candidates"][0]["content"]["parts"][0]["text"].strip()
 
-    # --- 3. HuggingFace ---
+def _call_huggingface(prompt):
+    hf_url = f"https://api-inference.huggingface.co/models/{HUGGINGFACE_MODEL}"
+    response = _session("HuggingFace").post(hf_url, headers=HEADERS_HUGGINGFACE, json={"inputs": prompt},
+                                            timeout=REQUEST_TIMEOUTS["HuggingFace"])
+    response.raise_for_status()
+    result = response.json()
+    if isinstance(result, list) and result:
+        return result[0].get("generated_text", prompt).strip()
+    return result.get("generated_text", prompt).strip()
+
+def _call_gpt4all(prompt):
+    return gpt4all_daemon.generate(prompt, max_tokens=GPT4ALL_MAX_TOKENS)
+
+def available_providers():
+    """(name, model, params, call) for every configured provider, in fallback order."""
+    providers = []
+    if OPENAI_API_KEY:
+        providers.append(("OpenAI", OPENAI_MODEL, {"system": SYSTEM_PROMPT}, _call_openai))
+    if GEMINI_API_KEY:
+        providers.append(("Gemini", GEMINI_MODEL, {}, _call_gemini))
     if HUGGINGFACE_API_KEY:
-        try:
-            HF_URL = "https://api-inference.huggingface.co/models/google/flan-t5-base"
-            response = requests.post(HF_URL, headers=HEADERS_HUGGINGFACE, json={"inputs": prompt}, timeout=10)
-            response.raise_for_status()
-            result = response.json()
-            if isinstance(result, list) and result:
-                return result[0].get("generated_text", prompt).strip()
-            return result.get("generated_text", prompt).strip()
-        except Exception as e:
-            logging.warning(f"HuggingFace fallback: {e}")
+        providers.append(("HuggingFace", HUGGINGFACE_MODEL, {}, _call_huggingface))
+    if USE_GPT4ALL:
+        providers.append(("GPT4All", GPT4ALL_MODEL, {"max_tokens": GPT4ALL_MAX_TOKENS}, _call_gpt4all))
+    return providers
 
-    # --- 4. GPT4All ---
-    if gpt4all_model:
+
+def _attempt(name, call, prompt):
+    """Run one provider call, feeding its latency or failure into the provider's health."""
+    health = provider_health(name)
+    started = time.monotonic()
+    try:
+        text = call(prompt)
+    except Exception:
+        health.record_failure()
+        raise
+    health.record_success(time.monotonic() - started)
+    return text
+
+def _generate_sequential(prompt, providers, attempt=_attempt):
+    for name, model, params, call in providers:
         try:
-            return gpt4all_model.generate(prompt, max_tokens=200).strip()
+            return name, model, params, attempt(name, call, prompt)
         except Exception as e:
-            logging.warning(f"GPT4All fallback error: {e}")
+            logging.warning(f"{name} fallback: {e}")
+    return None
+
+def _generate_hedged(prompt, providers, attempt=_attempt):
+    """Start the first provider; whenever the fastest pending one exceeds its p95, also start the next.
+
+    The first successful answer wins; slower calls are left to finish in the background.
+    """
+    executor = ThreadPoolExecutor(max_workers=len(providers))
+    pending = {}
+    queue = list(providers)
+    try:
+        while queue or pending:
+            if queue and not pending:
+                provider = queue.pop(0)
+                pending[executor.submit(attempt, provider[0], provider[3], prompt)] = provider
+            hedge_after = min(provider_health(p[0]).p95() for p in pending.values()) if queue else None
+            done, _ = wait(pending, timeout=hedge_after, return_when=FIRST_COMPLETED)
+            if not done:
+                provider = queue.pop(0)
+                logging.info(f"⏱️ Hedging with {provider[0]}")
+                pending[executor.submit(attempt, provider[0], provider[3], prompt)] = provider
+                continue
+            for future in done:
+                name, model, params, _ = pending.pop(future)
+                try:
+                    return name, model, params, future.result()
+                except Exception as e:
+                    logging.warning(f"{name} fallback: {e}")
+        return None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _generate(prompt, providers, use_cache=True, hedged=None, attempt=_attempt):
+    """Cache lookup, open-circuit filtering and provider fallback for one prompt (single and batch paths)."""
+    # Any provider's earlier answer to the same prompt is good enough on a rerun
+    if use_cache:
+        cached = ai_cache.lookup([(name, model, prompt, params) for name, model, params, _ in providers])
+        if cached is not None:
+            logging.info(f"💾 AI cache hit ({cached[0]})")
+            return cached[1]
+
+    healthy = [p for p in providers if not provider_health(p[0]).is_open()]
+    if len(healthy) < len(providers):
+        logging.info(f"🔌 Skipping providers with open circuits: {[p[0] for p in providers if p not in healthy]}")
+
+    hedged = HEDGED_MODE if hedged is None else hedged
+    if hedged and len(healthy) > 1:
+        result = _generate_hedged(prompt, healthy, attempt)
+    else:
+        result = _generate_sequential(prompt, healthy, attempt)
+    if result:
+        name, model, params, text = result
+        if use_cache:
+            ai_cache.put(name, model, prompt, text, params)
+        return text
 
     logging.error("All AI services failed. Returning raw prompt.")
     return f"[FAILED] {prompt}"  # Slightly clearer return in failure cases
 
+
+def generate_text(prompt: str, category: str = "general", use_cache: bool = True, hedged: bool = None) -> str:
+    """Generate text using the best available AI source."""
+    return _generate(prompt, available_providers(), use_cache, hedged)
+
+# === Batch API ===
+class _RateLimiter:
+    """Spaces request starts evenly so a provider never sees more than `per_minute` calls a minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = max(0.0, self.next_slot - now)
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay:
+            time.sleep(delay)
+
+def _limited_attempt(limits, name, call, prompt):
+    """_attempt inside the provider's batch concurrency slot and request-rate budget."""
+    semaphore, limiter = limits[name]
+    with semaphore:
+        limiter.wait()
+        return _attempt(name, call, prompt)
+
+async def generate_text_many_async(prompts, use_cache=True, hedged=None):
+    """Run many prompts concurrently, bounded per provider; results come back in input order.
+
+    Each prompt goes through the same path as generate_text (cache, circuit
+    breakers, fallback or hedging); only the provider calls are throttled.
+    """
+    providers = available_providers()
+    limits = {name: (threading.BoundedSemaphore(PROVIDER_CONCURRENCY.get(name, 4)), _RateLimiter(PROVIDER_RPM.get(name)))
+              for name, _, _, _ in providers}
+    attempt = partial(_limited_attempt, limits)
+    workers = sum(PROVIDER_CONCURRENCY.get(name, 4) for name in limits) + 2
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return await asyncio.gather(*(loop.run_in_executor(executor, _generate, p, providers, use_cache, hedged, attempt)
+                                      for p in prompts))
+
+def generate_text_many(prompts, use_cache=True, hedged=None):
+    """Blocking wrapper around generate_text_many_async for scripts."""
+    started = time.monotonic()
+    results = asyncio.run(generate_text_many_async(list(prompts), use_cache, hedged))
+    failed = sum(1 for r in results if r.startswith("[FAILED]"))
+    logging.info(f"🧠 Batch of {len(results)} prompts finished in {time.monotonic() - started:.1f}s ({failed} failed)")
+    return results
+
 if __name__ == "__main__":
     sample_prompt = "Generate a compelling YouTube video title for a 'Fails Compilation' using the keywords: epic, hilarious, compilation."
     print("🧠 AI Output:", generate_text(sample_prompt, category="Fails"))
+    print("💾 Cache:", ai_cache.stats())
@@ -0,0 +1,185 @@
+import os
+import logging
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import numpy as np
+from ffmpeg_utils import FFMPEG_BIN
+import media_catalog
+
+# === Paths ===
+FULL_VIDEOS_DIR = Path("downloads/full_videos")
+CLIPS_DIR = Path("downloads/clips")
+LOGS_DIR = Path("logs")
+LOGS_DIR.mkdir(parents=True, exist_ok=True)
+
+# === Logging ===
+logging.basicConfig(
+    filename=LOGS_DIR / "clip_extractor_log.txt",
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+# === Scene Detection Settings ===
+ANALYSIS_FPS = 4
+ANALYSIS_SIZE = (64, 36)
+HIST_BINS = 32
+BATCH_FRAMES = 512
+CUT_THRESHOLD = 0.35
+
+# === Clip Length Range (seconds) ===
+MIN_CLIP_SECONDS = 5
+MAX_CLIP_SECONDS = 60
+
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", os.cpu_count() or 2))
+
+
+# === Scene Detection ===
+def _frame_batches(video_path):
+    """Yield (n, h, w) uint8 arrays of downsampled grayscale frames."""
+    w, h = ANALYSIS_SIZE
+    frame_bytes = w * h
+    proc = subprocess.Popen(
+        [FFMPEG_BIN, "-v", "error", "-i", str(video_path),
+         "-vf", f"fps={ANALYSIS_FPS},scale={w}:{h},format=gray", "-f", "rawvideo", "pipe:1"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            data = proc.stdout.read(frame_bytes * BATCH_FRAMES)
+            n = len(data) // frame_bytes
+            if n == 0:
+                break
+            yield np.frombuffer(data[:n * frame_bytes], dtype=np.uint8).reshape(n, h, w)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+def _histograms(frames):
+    """Normalized per-frame intensity histograms for a whole batch in one bincount."""
+    n = len(frames)
+    bins = (frames.reshape(n, -1) >> (8 - int(np.log2(HIST_BINS)))).astype(np.int64)
+    offsets = np.arange(n, dtype=np.int64)[:, None] * HIST_BINS
+    counts = np.bincount((bins + offsets).ravel(), minlength=n * HIST_BINS).reshape(n, HIST_BINS)
+    return counts / counts.sum(axis=1, keepdims=True)
+
+def detect_scene_cuts(video_path):
+    """Return (cut_times_seconds, total_seconds) using histogram + frame difference scores."""
+    cuts = []
+    prev_frame = prev_hist = None
+    offset = 0
+    for frames in _frame_batches(video_path):
+        hists = _histograms(frames)
+        flat = frames.reshape(len(frames), -1).astype(np.int16)
+        if prev_frame is not None:
+            hists_all = np.vstack([prev_hist, hists])
+            flat_all = np.vstack([prev_frame, flat])
+        else:
+            hists_all, flat_all = hists, flat
+        hist_diff = 0.5 * np.abs(np.diff(hists_all, axis=0)).sum(axis=1)          # 0..1
+        pixel_diff = np.abs(np.diff(flat_all, axis=0)).mean(axis=1) / 255.0       # 0..1
+        score = 0.6 * hist_diff + 0.4 * pixel_diff
+        first = offset if prev_frame is None else offset - 1
+        for i in np.nonzero(score > CUT_THRESHOLD)[0]:
+            cuts.append((first + i + 1) / ANALYSIS_FPS)
+        prev_frame, prev_hist = flat[-1:], hists[-1:]
+        offset += len(frames)
+    return cuts, offset / ANALYSIS_FPS
+
+def scenes_to_segments(cuts, total, min_len=MIN_CLIP_SECONDS, max_len=MAX_CLIP_SECONDS):
+    """Merge short scenes forward and split long ones so every segment fits the length range."""
+    bounds = [0.0] + [c for c in cuts if 0 < c < total] + [total]
+    segments = []
+    start = bounds[0]
+    for end in bounds[1:]:
+        if end - start < min_len:
+            continue
+        pieces = int(np.ceil((end - start) / max_len))
+        step = (end - start) / pieces
+        segments.extend((start + k * step, start + (k + 1) * step) for k in range(pieces))
+        start = end
+    return [(round(s, 3), round(e, 3)) for s, e in segments]
+
+
+# === Cutting ===
+def cut_clip(source, start, end, output_path):
+    subprocess.run(
+        [FFMPEG_BIN, "-y", "-v", "error", "-ss", f"{start:.3f}", "-i", str(source), "-t", f"{end - start:.3f}",
+         "-c:v", "libx264", "-preset", "veryfast", "-crf", "20", "-c:a", "aac", "-movflags", "+faststart",
+         str(output_path)],
+        capture_output=True, text=True, check=True
+    )
+
+def extract_clips(source, category):
+    """Detect scenes in one full video and cut them into clips. Returns clip metadata entries."""
+    source = Path(source)
+    out_dir = CLIPS_DIR / category
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    cuts, total = detect_scene_cuts(source)
+    entries = {}
+    for i, (start, end) in enumerate(scenes_to_segments(cuts, total)):
+        clip_name = f"{source.stem}_{i:03d}.mp4"
+        try:
+            cut_clip(source, start, end, out_dir / clip_name)
+        except subprocess.CalledProcessError as e:
+            logging.warning(f"⚠️ Failed to cut {clip_name}: {e.stderr}")
+            continue
+        entries[clip_name] = {
+            "category": category,
+            "source_video": source.name,
+            "start": start,
+            "end": end,
+            "duration": round(end - start, 3),
+        }
+    logging.info(f"✂️ {source.name}: {len(cuts)} cuts → {len(entries)} clips")
+    return entries
+
+
+# === Run Extraction ===
+def extract_category(category, workers=EXTRACT_WORKERS):
+    """Extract clips from every not-yet-processed full video of a category in parallel."""
+    source_dir = FULL_VIDEOS_DIR / category
+    if not source_dir.exists():
+        raise FileNotFoundError(f"Full video folder not found: {source_dir}")
+
+    done = media_catalog.processed_sources(category)
+    sources = [f for f in sorted(source_dir.glob("*.mp4")) if f.name not in done]
+    logging.info(f"🎬 Extracting clips for {category}: {len(sources)} new source videos")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(extract_clips, source, category): source for source in sources}
+        for future in as_completed(futures):
+            try:
+                # Catalogued as results arrive so an interrupted run keeps finished sources;
+                # sources that yield no clips are recorded too so they aren't decoded again
+                media_catalog.add_extraction(category, futures[future].name, future.result())
+            except Exception as e:
+                logging.error(f"💥 Extraction failed for {futures[future].name}: {e}")
+
+    return media_catalog.clip_metadata(category)
+
+def downloaded_categories():
+    """Categories with a full-video folder, i.e. everything the scraper has downloaded so far."""
+    if not FULL_VIDEOS_DIR.exists():
+        return []
+    return sorted(p.name for p in FULL_VIDEOS_DIR.iterdir() if p.is_dir())
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--category", default=None,
+                        help=f"Category to extract clips for (default: every folder in {FULL_VIDEOS_DIR})")
+    parser.add_argument("--workers", type=int, default=EXTRACT_WORKERS, help="Source videos to process in parallel")
+    args = parser.parse_args()
+
+    categories = [args.category] if args.category else downloaded_categories()
+    if not categories:
+        print(f"⚠️ No category folders in {FULL_VIDEOS_DIR}; nothing to extract")
+    for category in categories:
+        try:
+            metadata = extract_category(category, args.workers)
+            print(f"✅ {category}: {len(metadata)} clips listed in {media_catalog.CATALOG_DB}")
+        except Exception as e:
+            logging.error(f"💥 Extraction failed for {category}: {e}")
@@ -0,0 +1,153 @@
+import os
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+from ffmpeg_utils import FFMPEG_BIN
+
+# === Settings ===
+FINGERPRINT_FILENAME = "fingerprints.npz"
+SAMPLE_POINTS = (0.1, 0.35, 0.6, 0.85)  # Fractions of the clip duration to hash
+DUPLICATE_THRESHOLD = 10  # Mean differing bits (of 64) per sampled frame
+FINGERPRINT_WORKERS = int(os.environ.get("FINGERPRINT_WORKERS", os.cpu_count() or 4))
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount64(values):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    values = np.ascontiguousarray(values)
+    return _POPCOUNT8[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+# === Hashing ===
+def _grab_frame(path, t):
+    """One 9x8 grayscale frame at time t via fast keyframe seek."""
+    result = subprocess.run(
+        [FFMPEG_BIN, "-v", "error", "-ss", f"{t:.3f}", "-i", str(path), "-frames:v", "1",
+         "-vf", "scale=9:8,format=gray", "-f", "rawvideo", "pipe:1"],
+        capture_output=True, check=True
+    )
+    if len(result.stdout) < 72:
+        raise ValueError(f"No frame at {t:.1f}s in {path}")
+    return np.frombuffer(result.stdout[:72], dtype=np.uint8).reshape(8, 9)
+
+def dhash(frame):
+    """64-bit difference hash: one bit per horizontally adjacent pixel pair."""
+    bits = frame[:, 1:] > frame[:, :-1]
+    return np.packbits(bits.ravel()).view(">u8")[0].astype(np.uint64)
+
+def fingerprint_clip(path, duration):
+    return np.array([dhash(_grab_frame(path, duration * p)) for p in SAMPLE_POINTS], dtype=np.uint64)
+
+
+# === Index ===
+class FingerprintIndex:
+    """Clip fingerprints as one (N, frames) uint64 array with vectorized Hamming search."""
+
+    def __init__(self, names=(), hashes=None, sizes=None, mtimes=None):
+        self.names = list(names)
+        self.hashes = hashes if hashes is not None else np.zeros((0, len(SAMPLE_POINTS)), dtype=np.uint64)
+        self.sizes = sizes if sizes is not None else np.zeros(0, dtype=np.int64)
+        self.mtimes = mtimes if mtimes is not None else np.zeros(0, dtype=np.int64)
+        self.positions = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def load(cls, category_dir):
+        path = Path(category_dir) / FINGERPRINT_FILENAME
+        if not path.exists():
+            return cls()
+        try:
+            data = np.load(path)
+            return cls(data["names"].tolist(), data["hashes"], data["sizes"], data["mtimes"])
+        except (OSError, KeyError, ValueError) as e:
+            logging.warning(f"⚠️ Rebuilding unreadable fingerprint index {path}: {e}")
+            return cls()
+
+    def save(self, category_dir):
+        path = Path(category_dir) / FINGERPRINT_FILENAME
+        tmp_path = path.with_name("fingerprints.tmp.npz")
+        np.savez(tmp_path, names=np.array(self.names, dtype=str), hashes=self.hashes,
+                 sizes=self.sizes, mtimes=self.mtimes)
+        os.replace(tmp_path, path)
+
+    def is_fresh(self, path):
+        i = self.positions.get(path.name)
+        if i is None:
+            return False
+        stat = path.stat()
+        return self.sizes[i] == stat.st_size and self.mtimes[i] == stat.st_mtime_ns
+
+    def upsert(self, entries):
+        """entries: list of (name, hashes, size, mtime_ns)."""
+        replaced = {e[0] for e in entries}
+        keep = [i for i, name in enumerate(self.names) if name not in replaced]
+        names = [self.names[i] for i in keep] + [e[0] for e in entries]
+        hashes = np.vstack([self.hashes[keep]] + [e[1][None, :] for e in entries])
+        sizes = np.concatenate([self.sizes[keep], np.array([e[2] for e in entries], dtype=np.int64)])
+        mtimes = np.concatenate([self.mtimes[keep], np.array([e[3] for e in entries], dtype=np.int64)])
+        self.__init__(names, hashes, sizes, mtimes)
+
+    def distances(self, query, rows=None):
+        """Mean Hamming distance per sampled frame between query hashes and indexed clips."""
+        hashes = self.hashes if rows is None else self.hashes[rows]
+        return _popcount64(hashes ^ query[None, :]).mean(axis=1)
+
+    def near_duplicates(self, name, threshold=DUPLICATE_THRESHOLD):
+        i = self.positions.get(name)
+        if i is None:
+            return []
+        dist = self.distances(self.hashes[i])
+        return [self.names[j] for j in np.nonzero(dist <= threshold)[0] if j != i]
+
+    def dedupe(self, names, threshold=DUPLICATE_THRESHOLD):
+        """Keep the first clip of every near-duplicate group, in the given order.
+
+        Each clip is compared against every clip kept so far with one vectorized
+        Hamming pass, so any pair within the threshold is caught (same test as
+        near_duplicates).
+        """
+        kept = []
+        kept_hashes = np.empty((len(names), self.hashes.shape[1]), dtype=np.uint64)
+        count = 0
+        limit = threshold * self.hashes.shape[1]  # Mean per frame <= threshold, summed over frames
+        for name in names:
+            i = self.positions.get(name)
+            if i is None:
+                kept.append(name)  # No fingerprint yet; can't judge it
+                continue
+            query = self.hashes[i]
+            if count and (_popcount64(kept_hashes[:count] ^ query[None, :]).sum(axis=1) <= limit).any():
+                continue
+            kept.append(name)
+            kept_hashes[count] = query
+            count += 1
+        return kept
+
+
+# === Refresh ===
+def _fingerprint_entry(args):
+    path, duration = args
+    stat = path.stat()
+    return path.name, fingerprint_clip(path, duration), stat.st_size, stat.st_mtime_ns
+
+def refresh_fingerprints(category_dir, video_files, probes):
+    """Fingerprint new or changed clips in parallel and return the category index."""
+    index = FingerprintIndex.load(category_dir)
+    stale = [f for f in video_files if not index.is_fresh(f) and probes.get(f.name, {}).get("duration")]
+    if stale:
+        logging.info(f"🔏 Fingerprinting {len(stale)} clips in {category_dir}")
+        entries = []
+        with ThreadPoolExecutor(max_workers=FINGERPRINT_WORKERS) as pool:
+            futures = [pool.submit(_fingerprint_entry, (f, probes[f.name]["duration"])) for f in stale]
+            for f, future in zip(stale, futures):
+                try:
+                    entries.append(future.result())
+                except (subprocess.CalledProcessError, OSError, ValueError) as e:
+                    logging.warning(f"⚠️ Could not fingerprint {f.name}: {e}")
+        if entries:
+            index.upsert(entries)
+            index.save(category_dir)
+    return index
@@ -0,0 +1,117 @@
+import math
+import logging
+from composition_index import CompositionIndex
+
+
+class ClipSelectionError(RuntimeError):
+    """Raised when no clip set can satisfy the duration window."""
+
+
+SEARCH_BITS = 1 << 17  # Width of the reach bitset; the window is scaled to use all of it
+
+
+# === Overlap Rule ===
+def overlap_safe_pool(names, past_compositions, max_overlap):
+    """Keep clips in order while no past composition gets more than max_overlap members.
+
+    Any subset of the returned pool satisfies the repeated-grouping rule, so the
+    duration search below never has to reject a finished selection.
+    """
+    index = past_compositions if isinstance(past_compositions, CompositionIndex) else CompositionIndex(past_compositions)
+    tracker = index.tracker(max_overlap)
+    return [name for name in names if tracker.add(name)]
+
+
+# === Duration Search ===
+def _subset_in_window(durations, low, high, accept):
+    """Bounded subset-sum over integer durations using int bitsets.
+
+    Bit s of a reach mask is set when some subset of the items scanned so far
+    sums to s. After each item, every newly reachable total inside the window
+    is reconstructed, largest first, and offered to accept(); scanning stops at
+    the first subset it takes, so the result favours the earliest (shuffled)
+    candidates like the old greedy fill did. Returns the item indexes, or None.
+    """
+    if high < low:
+        return None
+    full = (1 << (high + 1)) - 1
+    window = full ^ ((1 << low) - 1)
+    reach = 1
+    prefixes = [reach]
+    tried = 0
+    for d in durations:
+        if d <= high:
+            extended = (reach | (reach << d)) & full
+            if extended != reach:
+                reach = extended
+        prefixes.append(reach)  # Unchanged steps share one int, so memory stays flat once reach saturates
+        fresh = reach & window & ~tried
+        tried |= fresh
+        while fresh:
+            target = fresh.bit_length() - 1  # largest untried total inside the window
+            fresh ^= 1 << target
+            chosen = []
+            for i in range(len(prefixes) - 2, -1, -1):
+                if (prefixes[i] >> target) & 1:
+                    continue  # still reachable without item i
+                chosen.append(i)
+                target -= durations[i]
+            if accept(chosen[::-1]):
+                return chosen[::-1]
+    return None
+
+
+def explain_infeasible(candidates, pool, min_duration, max_duration):
+    """Human-readable reason why no compilation fits the duration window."""
+    if not candidates:
+        return "no usable clips (all missing, unreadable or used too often)"
+    fitting = [d for _, d in candidates if d <= max_duration]
+    if not fitting:
+        return f"all {len(candidates)} usable clips are longer than {max_duration/60:.1f} minutes"
+    usable_total = sum(fitting)
+    if usable_total < min_duration:
+        return (f"only {usable_total/60:.1f} minutes of usable footage across {len(fitting)} clips; "
+                f"minimum is {min_duration/60:.1f}")
+    durations = dict(candidates)
+    pool_total = sum(durations[name] for name in pool if durations[name] <= max_duration)
+    if pool_total < min_duration:
+        return (f"only {pool_total/60:.1f} of {usable_total/60:.1f} usable minutes remain after the "
+                f"repeated-grouping rule")
+    return f"no combination of {len(pool)} clips lands between {min_duration/60:.1f} and {max_duration/60:.1f} minutes"
+
+
+def select_clip_set(candidates, min_duration, max_duration, past_compositions=(), max_overlap=None):
+    """Choose clips whose total duration falls inside [min_duration, max_duration].
+
+    candidates is an ordered list of (clip_name, duration_seconds); shuffle it
+    beforehand for variety. past_compositions may be a list of clip-name lists
+    or a prebuilt CompositionIndex. Raises ClipSelectionError with the reason when the
+    window cannot be met.
+    """
+    names = [name for name, _ in candidates]
+    pool = overlap_safe_pool(names, past_compositions, max_overlap) if max_overlap is not None else names
+    durations = dict(candidates)
+
+    def fits(chosen):
+        total = sum(durations[pool[i]] for i in chosen)
+        return min_duration <= total <= max_duration
+
+    # Durations are searched in fixed-point units so rounding rarely decides feasibility. Ceil never
+    # overshoots max_duration; floor also finds sets whose fractions push the ceiled total past the
+    # window. Either way the real total is checked before a set is taken.
+    scale = max(1, SEARCH_BITS // (int(max_duration) + 1))
+    chosen = _subset_in_window([math.ceil(durations[name] * scale) for name in pool],
+                               math.ceil(min_duration * scale), math.floor(max_duration * scale), fits)
+    if chosen is None:
+        # Each floored clip can lose up to one unit, so the lower bound gets that much slack
+        slack = min(len(pool), 64)
+        chosen = _subset_in_window([math.floor(durations[name] * scale) for name in pool],
+                                   max(0, math.floor(min_duration * scale) - slack),
+                                   math.floor(max_duration * scale), fits)
+    if chosen is None:
+        raise ClipSelectionError(explain_infeasible(candidates, pool, min_duration, max_duration))
+
+    selected = [pool[i] for i in chosen]
+    total = sum(durations[name] for name in selected)
+    logging.info(f"🧮 Selected {len(selected)} of {len(candidates)} clips ({total/60:.1f} minutes)")
+    return selected
@@ -0,0 +1,66 @@
+from collections import Counter
+
+
+class CompositionIndex:
+    """Inverted index from clip name to the past compositions that used it.
+
+    Overlap between a candidate set and every remembered composition costs one
+    dict lookup per candidate clip, independent of how long the history is.
+    """
+
+    def __init__(self, compositions=()):
+        self.clip_to_compositions = {}
+        self.size = 0
+        for comp in compositions:
+            self.add(comp)
+
+    def add(self, clip_names):
+        comp_id = self.size
+        for name in set(clip_names):
+            self.clip_to_compositions.setdefault(name, []).append(comp_id)
+        self.size += 1
+        return comp_id
+
+    def compositions_for(self, clip_name):
+        return self.clip_to_compositions.get(clip_name, ())
+
+    def overlap_counts(self, clip_names):
+        """Counter of composition id -> number of shared clips."""
+        counts = Counter()
+        for name in set(clip_names):
+            counts.update(self.clip_to_compositions.get(name, ()))
+        return counts
+
+    def max_overlap(self, clip_names):
+        counts = self.overlap_counts(clip_names)
+        return max(counts.values()) if counts else 0
+
+    def has_repeated_grouping(self, clip_names, limit):
+        return self.max_overlap(clip_names) > limit
+
+    def tracker(self, limit):
+        return OverlapTracker(self, limit)
+
+
+class OverlapTracker:
+    """Incremental overlap check for a selection that grows one clip at a time."""
+
+    def __init__(self, index, limit):
+        self.index = index
+        self.limit = limit
+        self.counts = Counter()
+        self.members = set()
+
+    def can_add(self, clip_name):
+        if clip_name in self.members:
+            return True
+        return all(self.counts[c] < self.limit for c in self.index.compositions_for(clip_name))
+
+    def add(self, clip_name):
+        """Add the clip if it keeps every composition within the limit. Returns whether it was added."""
+        if not self.can_add(clip_name):
+            return False
+        if clip_name not in self.members:
+            self.members.add(clip_name)
+            self.counts.update(self.index.compositions_for(clip_name))
+        return True
@@ -3,6 +3,7 @@ import json
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
+from video_registry import get_registry
 
 # === Load environment variables ===
 load_dotenv()
@@ -20,6 +21,11 @@ logging.basicConfig(
 CONFIG_PATH = "config/config.json"
 API_INDEX_TRACKER = Path("logs/api_key_index.json")
 
+# === Config Loader ===
+def load_config():
+    with open(CONFIG_PATH) as f:
+        return json.load(f)
+
 # === Mapping Loader ===
 def load_mappings():
     with open("config/channel_mapping.json") as f:
@@ -152,3 +158,11 @@ def validate_storage_config(required_keys=None):
         logging.info("✅ All required storage config keys are present.")
 
     return len(missing_keys) == 0
+
+# === Video Registry ===
+def get_scraped_videos():
+    """Registry of scraped video IDs; supports fast `in` checks that see other processes' additions."""
+    return get_registry("scraped")
+
+def save_scraped_video(video_id, category=None):
+    get_registry("scraped").add(video_id, category)
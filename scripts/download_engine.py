@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+import requests
+
+# === Settings ===
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", "4"))
+BANDWIDTH_LIMIT_MBPS = float(os.environ.get("BANDWIDTH_LIMIT_MBPS", "0"))  # Shared by all workers; 0 = unlimited
+CHUNK_SIZE = 1024 * 1024
+REQUEST_TIMEOUT = 30
+METRICS_LOG = Path("logs/download_metrics.jsonl")
+
+
+class DownloadError(RuntimeError):
+    """A download failed after every retry; its .part file is kept for the next run."""
+
+
+# === Bandwidth Cap ===
+class TokenBucket:
+    """Byte budget refilled at `rate` bytes/s; callers that overdraw sleep off their debt."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = rate  # One second of burst
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            debt = -self.tokens
+        if debt > 0:
+            time.sleep(debt / self.rate)
+
+_bucket = TokenBucket(BANDWIDTH_LIMIT_MBPS * 125000) if BANDWIDTH_LIMIT_MBPS > 0 else None
+_session = requests.Session()
+
+
+# === Metrics ===
+_metrics_lock = threading.Lock()
+
+def record_metrics(entry):
+    """Append one download's throughput to the JSON-lines metrics log."""
+    METRICS_LOG.parent.mkdir(parents=True, exist_ok=True)
+    with _metrics_lock, open(METRICS_LOG, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+# === Download ===
+def part_path(output_path):
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.name + ".part")
+
+def _fetch(url, part, expected_size):
+    """Append the missing bytes of url to part, resuming with an HTTP Range request."""
+    offset = part.stat().st_size if part.exists() else 0
+    if expected_size and offset >= expected_size:
+        return 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with _session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        if response.status_code == 416:
+            return 0  # Nothing left past our offset
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            logging.warning(f"↩️ Server ignored Range for {part.name}; restarting from 0")
+            offset = 0
+        written = 0
+        with open(part, "ab" if offset else "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if _bucket:
+                    _bucket.consume(len(chunk))
+                f.write(chunk)
+                written += len(chunk)
+    return written
+
+def download_url(url, output_path, expected_size=None, retries=3, label=None):
+    """Download url to output_path via a resumable .part file, renamed into place only when complete.
+
+    Returns the metrics entry recorded for the download.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    part = part_path(output_path)
+    resumed_from = part.stat().st_size if part.exists() else 0
+    started = time.monotonic()
+    transferred = 0
+
+    for attempt in range(retries):
+        try:
+            transferred += _fetch(url, part, expected_size)
+            size = part.stat().st_size
+            if expected_size and size != expected_size:
+                raise DownloadError(f"size mismatch: got {size} bytes, expected {expected_size}")
+            os.replace(part, output_path)
+            break
+        except (requests.RequestException, OSError, DownloadError) as e:
+            logging.warning(f"❌ Attempt {attempt + 1} failed for {label or output_path.name}: {e}")
+            if isinstance(e, DownloadError) and part.exists():
+                part.unlink()  # Corrupt or oversized; resuming would only extend it
+    else:
+        raise DownloadError(f"Giving up on {label or output_path.name} after {retries} attempts")
+
+    elapsed = max(time.monotonic() - started, 1e-6)
+    entry = {
+        "file": str(output_path),
+        "label": label,
+        "bytes": transferred,
+        "resumed_from": resumed_from,
+        "seconds": round(elapsed, 3),
+        "mbps": round(transferred * 8 / elapsed / 1e6, 2),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+    }
+    record_metrics(entry)
+    logging.info(f"📥 {output_path.name}: {transferred / 1e6:.1f} MB in {elapsed:.1f}s ({entry['mbps']} Mbps)"
+                 + (f", resumed at {resumed_from / 1e6:.1f} MB" if resumed_from else ""))
+    return entry
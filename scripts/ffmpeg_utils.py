@@ -0,0 +1,128 @@
+import os
+import json
+import logging
+import subprocess
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+# === Binaries ===
+FFMPEG_BIN = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BIN = os.environ.get("FFPROBE_BINARY", "ffprobe")
+
+# === Encoding ===
+# Threads per encode; parallel renders are sized as cores // ENCODER_THREADS so jobs * threads ≈ cores
+ENCODER_THREADS = int(os.environ.get("ENCODER_THREADS", "2"))
+
+# Stream properties that must be identical for the concat demuxer to copy streams. The demuxer
+# copies mismatched H.264 profile/level or time bases without complaint and the output glitches.
+VIDEO_COPY_KEYS = ("video_codec", "video_profile", "video_level", "width", "height", "frame_rate", "pix_fmt",
+                   "video_time_base")
+AUDIO_COPY_KEYS = ("audio_codec", "sample_rate", "channels", "channel_layout")
+
+PROBE_VERSION = 2  # Bump when probe_clip gains fields so cached probes are refreshed
+
+DEFAULT_SIZE = (1920, 1080)
+DEFAULT_FPS = 30
+
+
+# === Probing ===
+def _parse_frame_rate(rate):
+    try:
+        num, den = rate.split("/")
+        return round(int(num) / int(den), 3) if int(den) else 0.0
+    except (AttributeError, ValueError):
+        return 0.0
+
+def probe_clip(path):
+    """Return the stream layout of a media file as reported by ffprobe."""
+    result = subprocess.run(
+        [FFPROBE_BIN, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", str(path)],
+        capture_output=True, text=True, check=True
+    )
+    data = json.loads(result.stdout)
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    fmt = data.get("format", {})
+
+    return {
+        "duration": float(fmt.get("duration") or video.get("duration") or 0.0),
+        "bit_rate": int(fmt.get("bit_rate") or 0),
+        "video_codec": video.get("codec_name"),
+        "video_profile": video.get("profile"),
+        "video_level": video.get("level"),
+        "video_time_base": video.get("time_base"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "frame_rate": video.get("r_frame_rate"),
+        "fps": _parse_frame_rate(video.get("r_frame_rate")),
+        "pix_fmt": video.get("pix_fmt"),
+        "has_audio": bool(audio),
+        "audio_codec": audio.get("codec_name"),
+        "sample_rate": int(audio.get("sample_rate") or 0),
+        "channels": audio.get("channels"),
+        "channel_layout": audio.get("channel_layout"),
+    }
+
+
+def can_stream_copy(probes):
+    """True when all probed clips share codec profile/level, resolution, frame rate, time base and audio layout."""
+    if not probes:
+        return False
+    reference = probes[0]
+    if not reference.get("video_codec"):
+        return False
+    for probe in probes[1:]:
+        if any(probe.get(k) != reference.get(k) for k in VIDEO_COPY_KEYS):
+            return False
+        if probe.get("has_audio") != reference.get("has_audio"):
+            return False
+        if reference.get("has_audio") and any(probe.get(k) != reference.get(k) for k in AUDIO_COPY_KEYS):
+            return False
+    return True
+
+
+def common_output_format(probes):
+    """Most common resolution and (rounded) frame rate among probed clips."""
+    sizes = Counter((p["width"], p["height"]) for p in probes if p.get("width"))
+    rates = Counter(round(p["fps"]) for p in probes if p.get("fps"))
+    size = sizes.most_common(1)[0][0] if sizes else DEFAULT_SIZE
+    fps = rates.most_common(1)[0][0] if rates else DEFAULT_FPS
+    return size, fps
+
+
+# === Concatenation ===
+def write_concat_list(paths, list_path):
+    """Write an ffmpeg concat demuxer list for the given files."""
+    with open(list_path, "w") as f:
+        for path in paths:
+            escaped = str(Path(path).resolve()).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+def concat_stream_copy(paths, output_path):
+    """Join clips with the concat demuxer without decoding or re-encoding."""
+    with tempfile.TemporaryDirectory() as tmp:
+        list_path = Path(tmp) / "concat.txt"
+        write_concat_list(paths, list_path)
+        subprocess.run(
+            [FFMPEG_BIN, "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", str(list_path),
+             "-map", "0", "-c", "copy", "-movflags", "+faststart", str(output_path)],
+            capture_output=True, text=True, check=True
+        )
+    logging.info(f"⚡ Stream-copied {len(paths)} clips into {output_path}")
+    return output_path
+
+def mux_streams(video_path, audio_path, output_path, output_format=None):
+    """Combine a video-only and an audio-only file into one container without re-encoding.
+
+    output_format forces the muxer when output_path has no telling extension (e.g. a temp name).
+    """
+    format_args = ["-f", output_format] if output_format else []
+    subprocess.run(
+        [FFMPEG_BIN, "-y", "-v", "error", "-i", str(video_path), "-i", str(audio_path),
+         "-map", "0:v:0", "-map", "1:a:0", "-c", "copy", "-shortest", "-movflags", "+faststart",
+         *format_args, str(output_path)],
+        capture_output=True, text=True, check=True
+    )
+    return output_path
@@ -0,0 +1,101 @@
+import logging
+import subprocess
+import tempfile
+from pathlib import Path
+from ffmpeg_utils import ENCODER_THREADS, FFMPEG_BIN, can_stream_copy, common_output_format, write_concat_list
+from generate_watermark import get_watermark_image
+
+# === Output Settings ===
+AUDIO_RATE = 48000
+LOUDNESS_TARGET = "I=-16:TP=-1.5:LRA=11"  # EBU R128 targets used for YouTube
+
+
+def _scale_chain(w, h, fps):
+    return (f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+            f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps},format=yuv420p")
+
+def _audio_chain():
+    return f"aresample={AUDIO_RATE},aformat=sample_fmts=fltp:channel_layouts=stereo"
+
+def _finish_graph(parts, video_out, audio_out, watermark_input, loudnorm):
+    if watermark_input is not None:
+        parts.append(f"[{video_out}][{watermark_input}:v]overlay=x=0:y=H-h[vout]")
+        video_out = "vout"
+    if loudnorm:
+        parts.append(f"[{audio_out}]loudnorm={LOUDNESS_TARGET}[aout]")
+        audio_out = "aout"
+    return ";\n".join(parts), video_out, audio_out
+
+def build_filtergraph(probes, size, fps, watermark_input=None, loudnorm=True):
+    """One filtergraph: per-clip scale/pad/fps + audio resample, concat, overlay, loudnorm."""
+    w, h = size
+    parts = []
+    pairs = []
+    for i, probe in enumerate(probes):
+        parts.append(f"[{i}:v:0]{_scale_chain(w, h, fps)}[v{i}]")
+        if probe.get("has_audio"):
+            parts.append(f"[{i}:a:0]{_audio_chain()}[a{i}]")
+        else:
+            parts.append(f"anullsrc=r={AUDIO_RATE}:cl=stereo,atrim=duration={probe['duration']:.3f}[a{i}]")
+        pairs.append(f"[v{i}][a{i}]")
+    parts.append(f"{''.join(pairs)}concat=n={len(probes)}:v=1:a=1[vcat][acat]")
+    return _finish_graph(parts, "vcat", "acat", watermark_input, loudnorm)
+
+def build_concat_filtergraph(probes, size, fps, watermark_input=None, loudnorm=True):
+    """Same output as build_filtergraph for clips already joined by the concat demuxer as input 0."""
+    w, h = size
+    parts = [f"[0:v:0]{_scale_chain(w, h, fps)}[vcat]"]
+    if probes[0].get("has_audio"):
+        parts.append(f"[0:a:0]{_audio_chain()}[acat]")
+    else:
+        total = sum(p["duration"] for p in probes)
+        parts.append(f"anullsrc=r={AUDIO_RATE}:cl=stereo,atrim=duration={total:.3f}[acat]")
+    return _finish_graph(parts, "vcat", "acat", watermark_input, loudnorm)
+
+
+def fused_render(selected_files, output_path, probes, watermark_text=None, loudnorm=True):
+    """Concatenate, watermark and loudness-normalize in a single ffmpeg encode.
+
+    Clips that can_stream_copy enter as one concat-demuxer input, so only one
+    demuxer and decoder run; mixed clips get one single-threaded decoder each
+    to bound memory and open files on long compilations.
+    """
+    clip_probes = [probes[f] for f in selected_files]
+    size, fps = common_output_format(clip_probes)
+    demuxed = can_stream_copy(clip_probes)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if demuxed:
+            list_path = Path(tmp) / "concat.txt"
+            write_concat_list(selected_files, list_path)
+            inputs = ["-threads", "1", "-f", "concat", "-safe", "0", "-i", str(list_path)]
+            input_count = 1
+        else:
+            inputs = []
+            for file in selected_files:
+                inputs += ["-threads", "1", "-i", str(file)]
+            input_count = len(selected_files)
+
+        watermark_input = None
+        if watermark_text:
+            watermark_png = get_watermark_image(watermark_text, size)
+            inputs += ["-i", str(watermark_png)]
+            watermark_input = input_count
+
+        build = build_concat_filtergraph if demuxed else build_filtergraph
+        graph, video_out, audio_out = build(clip_probes, size, fps, watermark_input, loudnorm)
+        script_path = Path(tmp) / "graph.txt"
+        script_path.write_text(graph)
+
+        subprocess.run(
+            [FFMPEG_BIN, "-y", "-v", "error", *inputs,
+             "-filter_complex_script", str(script_path),
+             "-map", f"[{video_out}]", "-map", f"[{audio_out}]",
+             "-c:v", "libx264", "-preset", "medium", "-crf", "20", "-threads", str(ENCODER_THREADS),
+             "-c:a", "aac", "-b:a", "192k", "-ar", str(AUDIO_RATE),
+             "-movflags", "+faststart", str(output_path)],
+            capture_output=True, text=True, check=True
+        )
+
+    logging.info(f"✅ Fused render of {len(selected_files)} clips into {output_path}")
+    return output_path
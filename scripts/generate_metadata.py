@@ -4,7 +4,7 @@ import random
 import logging
 from datetime import datetime
 from pathlib import Path
-from ai_helpers import generate_text  # 🧠 Unified AI fallback
+from ai_helpers import generate_text, generate_text_many  # 🧠 Unified AI fallback
 
 # Optional: fallback to config templates
 try:
@@ -36,20 +36,16 @@ DEFAULT_TAGS = {
 }
 
 
-def generate_metadata(category, clip_titles):
-    """Creates metadata using AI with fallback and saves to correct path."""
-    safe_category = category.replace(" ", "_").lower()
-    category_folder = METADATA_DIR / safe_category / "compilations"
-    category_folder.mkdir(parents=True, exist_ok=True)
-
-    prompt = (
+def build_prompt(category, clip_titles):
+    return (
         f"Write a compelling YouTube title, description, and tags for a compilation video "
         f"in the category '{category}' using these clip topics: {', '.join(clip_titles)}.\n\n"
         f"Return a JSON with fields: title, description, tags (list)."
     )
 
+def parse_metadata(category, result):
+    """Validate an AI response, falling back to the config/default template if it isn't usable."""
     try:
-        result = generate_text(prompt)
         metadata = json.loads(result)
 
         if not all(k in metadata for k in ("title", "description", "tags")):
@@ -59,19 +55,25 @@ def generate_metadata(category, clip_titles):
             metadata["tags"] = [tag.strip() for tag in metadata["tags"].split(",") if tag.strip()]
 
         logging.info(f"✅ AI-generated metadata for category: {category}")
+        return metadata
 
     except Exception as e:
         logging.warning(f"⚠️ AI fallback triggered: {e}")
-        config = get_upload_category_config(category) if get_upload_category_config else {}
+        config = (get_upload_category_config(category) if get_upload_category_config else None) or {}
 
-        metadata = {
+        return {
             "title": config.get("title_template", f"Best of {category} Compilation"),
             "description": config.get("description_template", f"Enjoy this collection of amazing {category.lower()} moments!"),
             "tags": config.get("tags", DEFAULT_TAGS.get(category, []))
         }
 
+def save_metadata(category, metadata, suffix=""):
+    safe_category = category.replace(" ", "_").lower()
+    category_folder = METADATA_DIR / safe_category / "compilations"
+    category_folder.mkdir(parents=True, exist_ok=True)
+
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{safe_category}_{timestamp}.json"
+    filename = f"{safe_category}_{timestamp}{suffix}.json"
     output_path = category_folder / filename
 
     with open(output_path, "w") as f:
@@ -82,15 +84,53 @@ def generate_metadata(category, clip_titles):
     return output_path
 
 
+def generate_metadata(category, clip_titles):
+    """Creates metadata using AI with fallback and saves to correct path."""
+    try:
+        result = generate_text(build_prompt(category, clip_titles))
+    except Exception as e:
+        result = ""
+        logging.warning(f"⚠️ AI call failed: {e}")
+    return save_metadata(category, parse_metadata(category, result))
+
+def generate_metadata_batch(items):
+    """Metadata for many (category, clip_titles) compilations with concurrent AI calls.
+
+    Returns output paths in the same order as items; each item falls back to the
+    template on its own, so one bad response never sinks the batch.
+    """
+    items = list(items)
+    try:
+        results = generate_text_many([build_prompt(category, titles) for category, titles in items])
+    except Exception as e:
+        logging.warning(f"⚠️ Batch AI call failed, using templates: {e}")
+        results = [""] * len(items)
+
+    # Several files land in the same second, so number them to keep names unique
+    return [save_metadata(category, parse_metadata(category, result), suffix=f"_{i:03d}")
+            for i, ((category, _), result) in enumerate(zip(items, results))]
+
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser()
-    parser.add_argument("--category", required=True, help="Video category")
+    parser.add_argument("--category", help="Video category")
     parser.add_argument("--clips", nargs="*", help="List of clip titles")
+    parser.add_argument("--batch-file", default=None,
+                        help="JSON list of {category, clips} objects to generate in one run")
     args = parser.parse_args()
 
-    if not args.clips:
-        logging.warning(f"No clip titles provided for category: {args.category}")
+    if not args.batch_file and not args.category:
+        parser.error("--category is required unless --batch-file is given")
+
+    if args.batch_file:
+        with open(args.batch_file, "r") as f:
+            entries = json.load(f)
+        paths = generate_metadata_batch([(e["category"], e.get("clips", [])) for e in entries])
+        print(f"✅ Generated metadata for {len(paths)} compilations")
+    else:
+        if not args.clips:
+            logging.warning(f"No clip titles provided for category: {args.category}")
 
-    generate_metadata(args.category, args.clips or [])
+        generate_metadata(args.category, args.clips or [])
@@ -1,45 +1,154 @@
 import os
+import hashlib
+import subprocess
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
+from PIL import Image, ImageDraw, ImageFont
+from ffmpeg_utils import ENCODER_THREADS, FFMPEG_BIN, probe_clip
 
 # Directories
 PROCESSED_DIR = Path("downloads/processed_videos")
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+WATERMARK_CACHE_DIR = Path("assets/watermark_cache")
 
 # Watermark Settings
-WATERMARK_FONT = "Arial-Bold"
 WATERMARK_FONT_SIZE = 36
-WATERMARK_COLOR = "white"
-WATERMARK_POSITION = ("left", "bottom")
+WATERMARK_COLOR = (255, 255, 255)
 WATERMARK_OPACITY = 0.6
+WATERMARK_FONT_PATH = Path("assets/fonts/Arial_Bold.ttf")
+WATERMARK_WORKERS = max(1, (os.cpu_count() or 1) // ENCODER_THREADS)
+
+def _wrap_lines(draw, text, font, max_width):
+    """Greedy word wrap, matching TextClip's method='caption' box."""
+    lines, current = [], ""
+    for word in text.split():
+        candidate = f"{current} {word}".strip()
+        if current and draw.textlength(candidate, font=font) > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    return lines + [current] if current else lines
+
+@lru_cache(maxsize=None)
+def load_watermark_font(font_size=WATERMARK_FONT_SIZE):
+    """The bundled bold font at font_size, or Pillow's scalable default font at the same size."""
+    try:
+        return ImageFont.truetype(str(WATERMARK_FONT_PATH), font_size)
+    except OSError as e:
+        print(f"⚠️ Watermark font {WATERMARK_FONT_PATH} unavailable ({e}); using Pillow's default font")
+        return ImageFont.load_default(size=font_size)
+
+def render_watermark_image(watermark_text, video_width, output_path, font_size=WATERMARK_FONT_SIZE):
+    """Render the watermark text as an RGBA PNG (opacity baked in) for ffmpeg's overlay filter."""
+    font = load_watermark_font(font_size)
+
+    box_width = int(video_width * 0.8)
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    lines = _wrap_lines(measure, watermark_text, font, box_width)
+    line_height = font_size + 4
+    image = Image.new("RGBA", (box_width, line_height * len(lines) + 8), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    fill = WATERMARK_COLOR + (int(255 * WATERMARK_OPACITY),)
+    for i, line in enumerate(lines):
+        x = (box_width - draw.textlength(line, font=font)) // 2
+        draw.text((x, 4 + i * line_height), line, font=font, fill=fill)
+    image.save(output_path)
+    return output_path
+
+def get_watermark_image(watermark_text, resolution, font_size=WATERMARK_FONT_SIZE):
+    """Cached watermark PNG for (text, font size, video resolution); rendered on first use."""
+    key = hashlib.sha1(
+        f"{watermark_text}|{font_size}|{resolution[0]}x{resolution[1]}|{WATERMARK_OPACITY}|{WATERMARK_FONT_PATH}|{WATERMARK_FONT_PATH.exists()}".encode()
+    ).hexdigest()[:16]
+    WATERMARK_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cached = WATERMARK_CACHE_DIR / f"{key}.png"
+    if not cached.exists():
+        tmp_path = cached.with_name(f"{key}.{os.getpid()}.tmp.png")
+        render_watermark_image(watermark_text, resolution[0], tmp_path, font_size)
+        os.replace(tmp_path, cached)
+    return cached
 
 def apply_watermark(input_path, output_path, watermark_text):
     print(f"🎬 Applying watermark to {input_path.name} → {output_path.name}")
     try:
-        video = VideoFileClip(str(input_path))
-        txt_clip = TextClip(watermark_text, fontsize=WATERMARK_FONT_SIZE,
-                            font=WATERMARK_FONT, color=WATERMARK_COLOR, size=(video.w * 0.8, None), method='caption')
-        txt_clip = txt_clip.set_position(WATERMARK_POSITION).set_duration(video.duration)
-        final = CompositeVideoClip([video, txt_clip.set_opacity(WATERMARK_OPACITY)])
-        final.write_videofile(str(output_path), codec="libx264", audio_codec="aac", preset="superfast", verbose=False, logger=None)
+        probe = probe_clip(input_path)
+        overlay = get_watermark_image(watermark_text, (probe["width"], probe["height"]))
+        audio_args = ["-c:a", "copy"] if probe["has_audio"] else []
+        subprocess.run(
+            [FFMPEG_BIN, "-y", "-v", "error", "-i", str(input_path), "-i", str(overlay),
+             "-filter_complex", "[0:v][1:v]overlay=x=0:y=H-h",
+             "-c:v", "libx264", "-preset", "superfast", *audio_args,
+             "-movflags", "+faststart", str(output_path)],
+            capture_output=True, text=True, check=True
+        )
         print(f"✅ Watermarked video saved: {output_path}")
+        return output_path
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error applying watermark: {e.stderr}")
     except Exception as e:
         print(f"❌ Error applying watermark: {e}")
+    return None
+
+def watermark_text_for(category):
+    return f"{category.replace('_', ' ').title()} Compilation"
+
+def category_from_filename(video):
+    """Category slug of a video_processor output ("<category>_compilation_<timestamp>.mp4"), or None."""
+    stem = Path(video).stem
+    return stem.split("_compilation_")[0] if "_compilation_" in stem else None
+
+def watermark_directory(input_dir, category=None, workers=WATERMARK_WORKERS):
+    """Watermark every un-watermarked .mp4 in a folder with a pool of ffmpeg workers.
+
+    Each compilation is stamped with the category in its file name. With
+    `category`, only that category's compilations are processed; files without
+    a category prefix then get that category's text.
+    """
+    input_dir = Path(input_dir)
+    wanted = category.replace(" ", "_").lower() if category else None
+    jobs = []
+    for video in sorted(input_dir.glob("*.mp4")):
+        output_path = video.with_name(f"{video.stem}_wm.mp4")
+        if video.stem.endswith("_wm") or output_path.exists():
+            continue
+        file_category = category_from_filename(video)
+        if wanted and file_category and file_category != wanted:
+            continue
+        if not (file_category or wanted):
+            print(f"⚠️ Skipping {video.name}: no category in the file name; pass --category")
+            continue
+        jobs.append((video, output_path, watermark_text_for(file_category or wanted)))
+
+    print(f"🗂️ Watermarking {len(jobs)} videos in {input_dir} with {workers} workers")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda job: apply_watermark(*job), jobs))
+    done = [r for r in results if r]
+    print(f"✅ {len(done)}/{len(jobs)} videos watermarked")
+    return done
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
-    parser.add_argument("--input", required=True, help="Input video file path")
-    parser.add_argument("--category", required=True, help="Category for the video")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="Input video file path")
+    source.add_argument("--input-dir", help="Watermark every video in this folder (e.g. downloads/processed_videos)")
+    parser.add_argument("--category", help="Category for the video; with --input-dir, only that category's compilations")
+    parser.add_argument("--workers", type=int, default=WATERMARK_WORKERS, help="Parallel ffmpeg jobs for --input-dir")
     args = parser.parse_args()
 
-    input_video = Path(args.input)
-    if not input_video.exists():
-        raise FileNotFoundError(f"Input file not found: {input_video}")
+    if args.input_dir:
+        watermark_directory(args.input_dir, args.category, args.workers)
+    else:
+        if not args.category:
+            parser.error("--category is required with --input")
+        input_video = Path(args.input)
+        if not input_video.exists():
+            raise FileNotFoundError(f"Input file not found: {input_video}")
 
-    readable_category = args.category.replace("_", " ").title()
-    output_filename = f"{args.category}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_wm.mp4"
-    output_path = PROCESSED_DIR / output_filename
+        output_filename = f"{args.category}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_wm.mp4"
+        output_path = PROCESSED_DIR / output_filename
 
-    apply_watermark(input_video, output_path, watermark_text=f"{readable_category} Compilation")
+        apply_watermark(input_video, output_path, watermark_text=watermark_text_for(args.category))
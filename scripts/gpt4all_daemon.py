@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import queue
+import socket
+import logging
+import threading
+import subprocess
+import socketserver
+from pathlib import Path
+
+# === Settings ===
+GPT4ALL_MODEL = os.environ.get("GPT4ALL_MODEL", "mistral-7b-instruct-v0.1.Q4_0.gguf")
+SOCKET_PATH = Path(os.environ.get("GPT4ALL_SOCKET", "logs/gpt4all.sock"))
+DAEMON_LOG = Path("logs/gpt4all_daemon_log.txt")
+QUEUE_SIZE = int(os.environ.get("GPT4ALL_QUEUE_SIZE", "32"))  # Requests beyond this are rejected, not buffered
+BATCH_SIZE = 8
+BATCH_WAIT = 0.05  # Seconds to wait for more requests after the first one arrives
+IDLE_TIMEOUT = float(os.environ.get("GPT4ALL_IDLE_TIMEOUT", "1800"))  # Auto-started daemons exit after this long idle
+STARTUP_TIMEOUT = 120  # Model load can take a while on first start
+REQUEST_TIMEOUT = 300
+DEFAULT_MAX_TOKENS = 200
+
+
+class GPT4AllUnavailable(RuntimeError):
+    """The daemon could not be reached, is overloaded, or failed to generate."""
+
+
+# === Server ===
+class _Request:
+    def __init__(self, prompt, max_tokens):
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.done = threading.Event()
+        self.response = None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return  # Liveness probe from is_running()
+        try:
+            message = json.loads(line)
+            request = _Request(message["prompt"], int(message.get("max_tokens", DEFAULT_MAX_TOKENS)))
+        except (ValueError, KeyError, TypeError) as e:
+            return self._reply({"error": f"bad request: {e}"})
+        try:
+            self.server.requests.put_nowait(request)
+        except queue.Full:
+            return self._reply({"error": "busy"})
+        request.done.wait()
+        self._reply(request.response)
+
+    def _reply(self, payload):
+        self.wfile.write((json.dumps(payload) + "\n").encode())
+
+
+class GPT4AllServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves prompts from one resident model; a single worker thread drains a bounded queue in batches."""
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, socket_path=SOCKET_PATH, model_name=GPT4ALL_MODEL):
+        from gpt4all import GPT4All
+        logging.info(f"🧠 Loading {model_name}")
+        self.model = GPT4All(model_name)
+        self.requests = queue.Queue(maxsize=QUEUE_SIZE)
+        self.socket_path = Path(socket_path)
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            self.socket_path.unlink()  # Stale socket from a crashed daemon; the start lock guarantees we're alone
+        super().__init__(str(self.socket_path), _Handler)
+        self.worker = threading.Thread(target=self._work, daemon=True)
+
+    def _next_batch(self):
+        """Block for one request, then gather whatever else arrives within BATCH_WAIT."""
+        batch = [self.requests.get(timeout=IDLE_TIMEOUT)]
+        deadline = time.monotonic() + BATCH_WAIT
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        while True:
+            try:
+                batch = self._next_batch()
+            except queue.Empty:
+                logging.info(f"💤 Idle for {IDLE_TIMEOUT:.0f}s, shutting down")
+                self.shutdown()
+                return
+            # The bindings run one generation at a time, so identical prompts in a batch are answered once
+            groups = {}
+            for request in batch:
+                groups.setdefault((request.prompt, request.max_tokens), []).append(request)
+            started = time.monotonic()
+            for (prompt, max_tokens), waiting in groups.items():
+                try:
+                    response = {"text": self.model.generate(prompt, max_tokens=max_tokens).strip()}
+                except Exception as e:
+                    logging.error(f"❌ Generation failed: {e}")
+                    response = {"error": str(e)}
+                for request in waiting:
+                    request.response = response
+                    request.done.set()
+            logging.info(f"✅ Served {len(batch)} requests ({len(groups)} unique) in {time.monotonic() - started:.1f}s")
+
+    def serve(self):
+        self.worker.start()
+        logging.info(f"🔌 Listening on {self.socket_path}")
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+            self.socket_path.unlink(missing_ok=True)
+
+
+# === Client ===
+def is_running(socket_path=SOCKET_PATH):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(socket_path))
+        return True
+    except OSError:
+        return False
+
+def start_daemon(socket_path=SOCKET_PATH, timeout=STARTUP_TIMEOUT):
+    """Launch the daemon detached from the caller and wait until its socket accepts connections."""
+    if is_running(socket_path):
+        return
+    DAEMON_LOG.parent.mkdir(parents=True, exist_ok=True)
+    # Callers starting at the same moment queue here, so only the first one spawns a daemon
+    with open(f"{socket_path}.start.lock", "w") as start_lock:
+        fcntl.flock(start_lock, fcntl.LOCK_EX)
+        if is_running(socket_path):
+            return
+        with open(DAEMON_LOG, "a") as log:
+            # Detached with its own output, so callers run via subprocess.run(capture_output=True) aren't held open
+            process = subprocess.Popen([sys.executable, str(Path(__file__).resolve()), "--socket", str(socket_path)],
+                                       stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if is_running(socket_path):
+                return
+            if process.poll():  # Exit code 0 means a daemon started by hand holds the lock; keep waiting for it
+                raise GPT4AllUnavailable(f"Daemon exited with code {process.returncode} (see {DAEMON_LOG})")
+            time.sleep(0.5)
+    raise GPT4AllUnavailable(f"Daemon did not start within {timeout}s (see {DAEMON_LOG})")
+
+def generate(prompt, max_tokens=DEFAULT_MAX_TOKENS, socket_path=SOCKET_PATH, autostart=True, timeout=REQUEST_TIMEOUT):
+    """Generate text with the resident GPT4All model, starting the daemon on first use."""
+    if autostart:
+        start_daemon(socket_path)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(socket_path))
+            sock.sendall((json.dumps({"prompt": prompt, "max_tokens": max_tokens}) + "\n").encode())
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+    except OSError as e:
+        raise GPT4AllUnavailable(f"GPT4All daemon unreachable: {e}") from e
+    if not line:
+        raise GPT4AllUnavailable("GPT4All daemon closed the connection")
+    response = json.loads(line)
+    if "error" in response:
+        raise GPT4AllUnavailable(response["error"])
+    return response["text"]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve a resident GPT4All model over a Unix socket")
+    parser.add_argument("--socket", default=str(SOCKET_PATH), help="Unix socket path")
+    parser.add_argument("--model", default=GPT4ALL_MODEL, help="GPT4All model file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    Path(args.socket).parent.mkdir(parents=True, exist_ok=True)
+    # Held for the daemon's lifetime so concurrent auto-starts don't each load the model
+    start_lock = open(f"{args.socket}.lock", "w")
+    try:
+        fcntl.flock(start_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        print(f"🧠 GPT4All daemon already running on {args.socket}")
+        sys.exit(0)
+    GPT4AllServer(args.socket, args.model).serve()
@@ -0,0 +1,223 @@
+import json
+import logging
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# === Paths ===
+LOGS_DIR = Path("logs")
+HISTORY_DB = LOGS_DIR / "clip_history.db"
+LEGACY_HISTORY_FILE = LOGS_DIR / "clip_usage_history.json"
+LEGACY_COMPOSITION_FILE = LOGS_DIR / "video_clip_compositions.json"
+
+# === Limits ===
+MAX_USES_PER_CLIP = 15  # Older usage rows are pruned; nothing reads further back than this
+COMPOSITION_LIMIT = 2000  # Per category
+
+
+class UsageLimitError(RuntimeError):
+    """A clip reached its usage limit between planning and recording, claimed by a concurrent run."""
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clip_usage (
+    clip TEXT NOT NULL,
+    use_number INTEGER NOT NULL,
+    used_at TEXT NOT NULL,
+    composition_id INTEGER,
+    PRIMARY KEY (clip, use_number)
+);
+CREATE TABLE IF NOT EXISTS compositions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_compositions_category ON compositions (category, id);
+CREATE TABLE IF NOT EXISTS composition_clips (
+    composition_id INTEGER NOT NULL REFERENCES compositions(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    clip TEXT NOT NULL,
+    PRIMARY KEY (composition_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_composition_clips_clip ON composition_clips (clip);
+"""
+
+
+# === Connection ===
+def connect(db_path=HISTORY_DB):
+    """Open the history DB (WAL, manual transactions), migrating legacy JSON on first use."""
+    db_path = Path(db_path)
+    is_new = not db_path.exists()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    if is_new and db_path == HISTORY_DB and (LEGACY_HISTORY_FILE.exists() or LEGACY_COMPOSITION_FILE.exists()):
+        migrate_json(conn)
+    return conn
+
+@contextmanager
+def transaction(db_path=HISTORY_DB):
+    """Write transaction that takes the DB write lock up front so concurrent runs serialize."""
+    conn = connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+# === Reads ===
+def load_usage_history(db_path=HISTORY_DB):
+    """Return {clip_name: [use_number, ...]} in the shape the old JSON history had."""
+    conn = connect(db_path)
+    try:
+        history = {}
+        for clip, use_number in conn.execute("SELECT clip, use_number FROM clip_usage ORDER BY clip, use_number"):
+            history.setdefault(clip, []).append(use_number)
+        return history
+    finally:
+        conn.close()
+
+def load_compositions(db_path=HISTORY_DB, limit=COMPOSITION_LIMIT, category=None):
+    """Return the most recent compositions, oldest first, as lists of clip names.
+
+    With a category, that category's last `limit` compositions plus the
+    uncategorized ones imported from the legacy JSON; otherwise the last
+    `limit` of all categories.
+    """
+    if category is None:
+        recent = "SELECT id FROM compositions ORDER BY id DESC LIMIT ?"
+        params = (limit,)
+    else:
+        recent = ("SELECT id FROM compositions WHERE category = ? UNION ALL "
+                  "SELECT * FROM (SELECT id FROM compositions WHERE category IS NULL ORDER BY id DESC LIMIT ?) "
+                  "ORDER BY id DESC LIMIT ?")
+        params = (category, limit, limit * 2)
+    conn = connect(db_path)
+    try:
+        compositions = {}
+        for comp_id, clip in conn.execute(
+            f"SELECT cc.composition_id, cc.clip FROM ({recent}) recent "
+            "JOIN composition_clips cc ON cc.composition_id = recent.id ORDER BY cc.composition_id, cc.position",
+            params
+        ):
+            compositions.setdefault(comp_id, []).append(clip)
+        return list(compositions.values())
+    finally:
+        conn.close()
+
+
+# === Writes ===
+def _insert_usage(conn, clip_names, composition_id=None, max_uses=MAX_USES_PER_CLIP):
+    now = datetime.now(timezone.utc).isoformat()
+    for clip in clip_names:
+        last = conn.execute("SELECT MAX(use_number) FROM clip_usage WHERE clip = ?", (clip,)).fetchone()[0] or 0
+        conn.execute(
+            "INSERT INTO clip_usage (clip, use_number, used_at, composition_id) VALUES (?, ?, ?, ?)",
+            (clip, last + 1, now, composition_id)
+        )
+        conn.execute("DELETE FROM clip_usage WHERE clip = ? AND use_number <= ?", (clip, last + 1 - max_uses))
+
+def _insert_composition(conn, clip_names, limit=COMPOSITION_LIMIT, category=None):
+    comp_id = conn.execute(
+        "INSERT INTO compositions (category, created_at) VALUES (?, ?)",
+        (category, datetime.now(timezone.utc).isoformat())
+    ).lastrowid
+    conn.executemany(
+        "INSERT INTO composition_clips (composition_id, position, clip) VALUES (?, ?, ?)",
+        [(comp_id, i, clip) for i, clip in enumerate(clip_names)]
+    )
+    # Keep the newest `limit` of this category only, so busy categories don't push out quiet ones
+    conn.execute(
+        "DELETE FROM compositions WHERE category IS ? AND id <= "
+        "(SELECT id FROM compositions WHERE category IS ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+        (category, category, limit)
+    )
+    return comp_id
+
+def record_usage(clip_names, db_path=HISTORY_DB, max_uses=MAX_USES_PER_CLIP):
+    with transaction(db_path) as conn:
+        _insert_usage(conn, clip_names, max_uses=max_uses)
+
+def save_composition(clip_names, db_path=HISTORY_DB, limit=COMPOSITION_LIMIT, category=None):
+    with transaction(db_path) as conn:
+        return _insert_composition(conn, clip_names, limit, category)
+
+def record_compilation(clip_names, db_path=HISTORY_DB, max_uses=MAX_USES_PER_CLIP, limit=COMPOSITION_LIMIT,
+                       category=None):
+    """Atomically store a composition and bump usage for its clips.
+
+    Usage is re-checked under the write lock, so two categories or processes
+    planning at the same time can't both claim a clip's last allowed use.
+    """
+    with transaction(db_path) as conn:
+        for clip in clip_names:
+            used = conn.execute("SELECT COUNT(*) FROM clip_usage WHERE clip = ?", (clip,)).fetchone()[0]
+            if used >= max_uses:
+                raise UsageLimitError(f"🚫 Clip {clip} reached its usage limit in a concurrent run.")
+        comp_id = _insert_composition(conn, clip_names, limit, category)
+        _insert_usage(conn, clip_names, comp_id, max_uses)
+        return comp_id
+
+def release_compilation(comp_id, db_path=HISTORY_DB):
+    """Undo record_compilation for a compilation that was never rendered, freeing its clips' uses."""
+    with transaction(db_path) as conn:
+        conn.execute("DELETE FROM clip_usage WHERE composition_id = ?", (comp_id,))
+        conn.execute("DELETE FROM compositions WHERE id = ?", (comp_id,))
+
+
+# === Migration ===
+def migrate_json(conn=None, history_file=LEGACY_HISTORY_FILE, composition_file=LEGACY_COMPOSITION_FILE,
+                 max_uses=MAX_USES_PER_CLIP):
+    """One-shot import of the legacy clip_usage_history.json and video_clip_compositions.json.
+
+    Does nothing if the DB already holds history, so running it twice is safe.
+    """
+    own_conn = conn is None
+    conn = conn or connect()
+    history = json.loads(Path(history_file).read_text()) if Path(history_file).exists() else {}
+    compositions = json.loads(Path(composition_file).read_text()) if Path(composition_file).exists() else []
+    now = datetime.now(timezone.utc).isoformat()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        populated = conn.execute(
+            "SELECT EXISTS(SELECT 1 FROM clip_usage) OR EXISTS(SELECT 1 FROM compositions)"
+        ).fetchone()[0]
+        if populated:
+            conn.execute("ROLLBACK")
+            logging.info("⏭️ History DB already populated, skipping JSON migration.")
+            return 0, 0
+        for clip, uses in history.items():
+            conn.executemany(
+                "INSERT OR IGNORE INTO clip_usage (clip, use_number, used_at) VALUES (?, ?, ?)",
+                [(clip, use_number, now) for use_number in uses[-max_uses:]]
+            )
+        for clip_names in compositions:
+            _insert_composition(conn, clip_names)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+    logging.info(f"📦 Migrated {len(history)} clip histories and {len(compositions)} compositions to SQLite")
+    return len(history), len(compositions)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--migrate", action="store_true", help="Import the legacy JSON history files")
+    args = parser.parse_args()
+
+    if args.migrate:
+        clips, comps = migrate_json()
+        print(f"✅ Migrated {clips} clip histories and {comps} compositions into {HISTORY_DB}")
@@ -1,9 +1,16 @@
 # main.py
 
+import os
+import time
 import logging
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
 from scripts import schedule_manager
 from scripts.upload_all_for_category import process_category
 from scripts.config_manager import get_channel_for_category
+from scripts.ffmpeg_utils import ENCODER_THREADS
 
 logging.basicConfig(
     filename="logs/script_log.txt",
@@ -11,18 +18,81 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-def main():
+LOGS_DIR = Path("logs")
+
+
+def default_jobs():
+    return max(1, (os.cpu_count() or 1) // ENCODER_THREADS)
+
+def _category_log_path(category):
+    return LOGS_DIR / f"script_log_{category.replace(' ', '_').lower()}.txt"
+
+def run_category(category, own_log=False):
+    """Process one category and return a result record instead of raising."""
+    if own_log:
+        # Worker process: send everything to a per-category log so parallel runs don't interleave
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        handler = logging.FileHandler(_category_log_path(category))
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+
+    started = time.monotonic()
+    result = {"category": category, "ok": True, "error": None, "pid": os.getpid()}
+    try:
+        logging.info(f"🔁 Processing category: {category}")
+        process_category(category)
+    except Exception as e:
+        logging.exception(f"❌ Error processing category {category}: {str(e)}")
+        result.update(ok=False, error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+    result["elapsed"] = time.monotonic() - started
+    return result
+
+def log_summary(results, elapsed):
+    failed = [r for r in results if not r["ok"]]
+    logging.info(f"📊 Run summary: {len(results) - len(failed)}/{len(results)} categories succeeded in {elapsed:.1f}s")
+    for r in results:
+        status = "✅" if r["ok"] else "❌"
+        line = f"{status} {r['category']} ({r['elapsed']:.1f}s)"
+        if not r["ok"]:
+            line += f" — {r['error']}"
+        logging.info(line)
+        print(line)
+    return failed
+
+def main(jobs=1):
     categories = schedule_manager.get_today_categories()
     if not categories:
         logging.warning("📭 No categories scheduled for today.")
-        return
+        return []
+
+    started = time.monotonic()
+    jobs = max(1, min(jobs, len(categories)))
+    if jobs == 1:
+        results = [run_category(category) for category in categories]
+    else:
+        logging.info(f"🧵 Running {len(categories)} categories across {jobs} worker processes")
+        results = []
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(run_category, category, True): category for category in categories}
+            for future in as_completed(futures):
+                category = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # The worker itself died (e.g. killed by the OS), not just the category
+                    logging.exception(f"💥 Worker crashed for {category}: {e}")
+                    results.append({"category": category, "ok": False, "error": f"worker crashed: {e}", "elapsed": 0.0})
+        order = {category: i for i, category in enumerate(categories)}
+        results.sort(key=lambda r: order[r["category"]])
 
-    for category in categories:
-        try:
-            logging.info(f"🔁 Processing category: {category}")
-            process_category(category)
-        except Exception as e:
-            logging.exception(f"❌ Error processing category {category}: {str(e)}")
+    return log_summary(results, time.monotonic() - started)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=default_jobs(),
+                        help="Categories to process concurrently (default: cores / ENCODER_THREADS)")
+    args = parser.parse_args()
+    main(jobs=args.jobs)
@@ -0,0 +1,285 @@
+import json
+import logging
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from probe_cache import refresh_probe_cache
+
+# === Paths ===
+LOGS_DIR = Path("logs")
+CATALOG_DB = LOGS_DIR / "media_catalog.db"
+LEGACY_VIDEO_LOG = LOGS_DIR / "clip_metadata.json"
+CLIPS_DIR = Path("downloads/clips")
+CLIP_METADATA_FILENAME = "clip_metadata.json"  # Hand-maintained per-category lists; ingested when they change
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    title TEXT,
+    author TEXT,
+    length INTEGER,
+    url TEXT,
+    file_path TEXT,
+    downloaded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_videos_category ON videos (category);
+CREATE INDEX IF NOT EXISTS idx_videos_downloaded_at ON videos (downloaded_at);
+CREATE TABLE IF NOT EXISTS clips (
+    category TEXT NOT NULL,
+    name TEXT NOT NULL,
+    source_video TEXT,
+    start REAL,
+    end REAL,
+    duration REAL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (category, name)
+);
+CREATE INDEX IF NOT EXISTS idx_clips_source_video ON clips (source_video);
+CREATE INDEX IF NOT EXISTS idx_clips_category_duration ON clips (category, duration);
+CREATE TABLE IF NOT EXISTS extracted_sources (
+    category TEXT NOT NULL,
+    source_video TEXT NOT NULL,
+    clip_count INTEGER NOT NULL,
+    extracted_at TEXT NOT NULL,
+    PRIMARY KEY (category, source_video)
+);
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+# Clips added by hand carry only a category; extractor clips have every field
+UPSERT_CLIP = """
+INSERT INTO clips (category, name, source_video, start, end, duration, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (category, name) DO UPDATE SET
+    source_video = COALESCE(excluded.source_video, source_video),
+    start = COALESCE(excluded.start, start),
+    end = COALESCE(excluded.end, end),
+    duration = COALESCE(excluded.duration, duration)
+"""
+
+CLIP_FIELDS = ("category", "source_video", "start", "end", "duration")
+
+
+# === Connection ===
+def connect(db_path=CATALOG_DB):
+    """Open the catalog DB (WAL, manual transactions), importing the legacy JSON files on first use."""
+    db_path = Path(db_path)
+    is_new = not db_path.exists()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    if is_new and db_path == CATALOG_DB:
+        migrate_json(conn)
+    return conn
+
+@contextmanager
+def transaction(db_path=CATALOG_DB):
+    conn = connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+# === Writes ===
+def add_video(record, db_path=CATALOG_DB):
+    """Insert one downloaded source video (the dict youtube_scraper used to append to the JSON log)."""
+    with transaction(db_path) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO videos (id, category, title, author, length, url, file_path, downloaded_at) "
+            "VALUES (:id, :category, :title, :author, :length, :url, :file_path, :downloaded_at)",
+            {"title": None, "author": None, "length": None, "url": None, "file_path": None,
+             "downloaded_at": datetime.now(timezone.utc).isoformat(), **record}
+        )
+
+def _clip_rows(entries, created_at):
+    return [(e["category"], name, e.get("source_video"), e.get("start"), e.get("end"), e.get("duration"), created_at)
+            for name, e in entries.items()]
+
+def add_clips(entries, db_path=CATALOG_DB):
+    """Insert clips given as {clip_name: {category[, source_video, start, end, duration]}}."""
+    with transaction(db_path) as conn:
+        conn.executemany(UPSERT_CLIP, _clip_rows(entries, datetime.now(timezone.utc).isoformat()))
+
+def add_extraction(category, source_video, entries, db_path=CATALOG_DB):
+    """Store one source video's clips and mark it extracted, even when it yielded none."""
+    now = datetime.now(timezone.utc).isoformat()
+    with transaction(db_path) as conn:
+        conn.executemany(UPSERT_CLIP, _clip_rows(entries, now))
+        conn.execute(
+            "INSERT OR REPLACE INTO extracted_sources (category, source_video, clip_count, extracted_at) "
+            "VALUES (?, ?, ?, ?)", (category, source_video, len(entries), now)
+        )
+
+
+# === Hand-Maintained Lists ===
+def _with_probed_durations(category_dir, entries):
+    """Fill missing durations from the category's probe cache (probing only new/changed files)."""
+    missing = [Path(category_dir) / name for name, e in entries.items()
+               if e.get("duration") is None and (Path(category_dir) / name).exists()]
+    probes = refresh_probe_cache(category_dir, missing) if missing else {}
+    return {name: {**e, "duration": e.get("duration") if e.get("duration") is not None
+                   else probes.get(name, {}).get("duration")}
+            for name, e in entries.items()}
+
+def ingest_clip_metadata(category_dir, conn=None, force=False):
+    """Import a category's clip_metadata.json if it changed since the last ingest. Returns clips read."""
+    path = Path(category_dir) / CLIP_METADATA_FILENAME
+    if not path.exists():
+        return 0
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+        seen = conn.execute("SELECT mtime_ns FROM ingested_files WHERE path = ?", (str(path),)).fetchone()
+        if seen and seen[0] == mtime_ns and not force:
+            return 0
+        try:
+            raw = json.loads(path.read_text())
+        except ValueError as e:
+            logging.warning(f"⚠️ Skipping unreadable {path}: {e}")
+            return 0
+        entries = _with_probed_durations(category_dir, {
+            name: e for name, e in raw.items() if isinstance(e, dict) and e.get("category")
+        })
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(UPSERT_CLIP, _clip_rows(entries, datetime.now(timezone.utc).isoformat()))
+            conn.execute("INSERT OR REPLACE INTO ingested_files (path, mtime_ns) VALUES (?, ?)", (str(path), mtime_ns))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logging.info(f"📥 Ingested {len(entries)} clips from {path}")
+        return len(entries)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+# === Queries ===
+def clip_metadata(category, min_duration=None, max_duration=None, db_path=CATALOG_DB):
+    """Return {clip_name: entry} for a category, in the shape of the old per-category JSON."""
+    sql = "SELECT name, category, source_video, start, end, duration FROM clips WHERE category = ?"
+    params = [category]
+    if min_duration is not None:
+        sql += " AND duration >= ?"
+        params.append(min_duration)
+    if max_duration is not None:
+        sql += " AND duration <= ?"
+        params.append(max_duration)
+    conn = connect(db_path)
+    try:
+        return {row[0]: dict(zip(CLIP_FIELDS, row[1:])) for row in conn.execute(sql, params)}
+    finally:
+        conn.close()
+
+def processed_sources(category, db_path=CATALOG_DB):
+    """Source video file names already extracted in this category, including ones that yielded no clips."""
+    conn = connect(db_path)
+    try:
+        return {row[0] for row in conn.execute(
+            "SELECT source_video FROM extracted_sources WHERE category = ? UNION "
+            "SELECT source_video FROM clips WHERE category = ? AND source_video IS NOT NULL", (category, category)
+        )}
+    finally:
+        conn.close()
+
+def clips_from_source(source_video, db_path=CATALOG_DB):
+    conn = connect(db_path)
+    try:
+        return [row[0] for row in conn.execute("SELECT name FROM clips WHERE source_video = ? ORDER BY start",
+                                               (source_video,))]
+    finally:
+        conn.close()
+
+def videos(category=None, since=None, db_path=CATALOG_DB):
+    """Downloaded source videos, newest first, optionally filtered by category and ISO download date."""
+    sql, params, where = "SELECT * FROM videos", [], []
+    if category is not None:
+        where.append("category = ?")
+        params.append(category)
+    if since is not None:
+        where.append("downloaded_at >= ?")
+        params.append(since)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY downloaded_at DESC"
+    conn = connect(db_path)
+    try:
+        conn.row_factory = sqlite3.Row
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+def stats(db_path=CATALOG_DB):
+    conn = connect(db_path)
+    try:
+        video_count = conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+        per_category = dict(conn.execute("SELECT category, COUNT(*) FROM clips GROUP BY category").fetchall())
+        return {"videos": video_count, "clips": per_category}
+    finally:
+        conn.close()
+
+
+# === Migration ===
+def migrate_json(conn=None, video_log=LEGACY_VIDEO_LOG, clips_dir=CLIPS_DIR):
+    """Import logs/clip_metadata.json and every downloads/clips/<category>/clip_metadata.json.
+
+    Safe to run repeatedly: videos already catalogued are kept, and clip lists
+    are re-read in full so hand-added clips are picked up.
+    """
+    own_conn = conn is None
+    conn = conn or connect()
+    video_records = json.loads(Path(video_log).read_text()) if Path(video_log).exists() else []
+    now = datetime.now(timezone.utc).isoformat()
+    clip_count = 0
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO videos (id, category, title, author, length, url, file_path, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(r["id"], r.get("category", ""), r.get("title"), r.get("author"), r.get("length"), r.get("url"),
+                  r.get("file_path"), r.get("downloaded_at", now)) for r in video_records if r.get("id")]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if Path(clips_dir).exists():
+            for category_dir in sorted(p.parent for p in Path(clips_dir).glob(f"*/{CLIP_METADATA_FILENAME}")):
+                clip_count += ingest_clip_metadata(category_dir, conn, force=True)
+    finally:
+        if own_conn:
+            conn.close()
+    if video_records or clip_count:
+        logging.info(f"📦 Migrated {len(video_records)} videos and {clip_count} clips into the media catalog")
+    return len(video_records), clip_count
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--migrate", action="store_true", help="Import the legacy clip_metadata.json files")
+    parser.add_argument("--ingest", metavar="CATEGORY",
+                        help=f"Re-read downloads/clips/<CATEGORY>/{CLIP_METADATA_FILENAME} (hand-added clips)")
+    args = parser.parse_args()
+
+    if args.migrate:
+        video_count, clip_count = migrate_json()
+        print(f"✅ Migrated {video_count} videos and {clip_count} clips into {CATALOG_DB}")
+    if args.ingest:
+        count = ingest_clip_metadata(CLIPS_DIR / args.ingest, force=True)
+        print(f"✅ Ingested {count} clips for {args.ingest}")
+    print(f"🗂️ Catalog: {stats()}")
@@ -0,0 +1,194 @@
+import os
+import hashlib
+import time
+import logging
+import sqlite3
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from ffmpeg_utils import FFMPEG_BIN
+
+# === Cache Settings ===
+NORMALIZED_DIR = Path("downloads/normalized")
+SOURCE_INDEX_DB = NORMALIZED_DIR / "sources.db"
+CACHE_BUDGET_BYTES = int(float(os.environ.get("NORMALIZED_CACHE_BUDGET_GB", "20")) * 1024 ** 3)
+# Segments used this recently are never evicted: a render in another process may be concatenating them
+EVICTION_GRACE_SECONDS = float(os.environ.get("NORMALIZED_CACHE_GRACE_HOURS", "6")) * 3600
+NORMALIZE_WORKERS = int(os.environ.get("NORMALIZE_WORKERS", max(1, (os.cpu_count() or 1) // 2)))
+
+# === House Profile ===
+# Every cached segment matches this exactly, so any set of them can be stream-copied together.
+HOUSE_PROFILE = {
+    "width": 1920,
+    "height": 1080,
+    "fps": 30,
+    "video_codec": "libx264",
+    "preset": "veryfast",
+    "crf": 20,
+    "gop": 60,
+    "audio_codec": "aac",
+    "audio_bitrate": "160k",
+    "sample_rate": 48000,
+    "channels": 2,
+}
+
+
+# === Keys ===
+def _profile_tag(profile):
+    return ",".join(f"{k}={profile[k]}" for k in sorted(profile))
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _connect_index():
+    NORMALIZED_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(SOURCE_INDEX_DB), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+        "mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL)"
+    )
+    return conn
+
+def source_hash(path):
+    """Content hash of a source clip, looked up by path, size and mtime; the file is only read when those change."""
+    path = Path(path).resolve()
+    stat = path.stat()
+    conn = _connect_index()
+    try:
+        row = conn.execute("SELECT size, mtime_ns, sha256 FROM sources WHERE path = ?", (str(path),)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        digest = content_hash(path)
+        conn.execute("INSERT OR REPLACE INTO sources (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                     (str(path), stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+    finally:
+        conn.close()
+
+def cache_key(path, profile=HOUSE_PROFILE):
+    """Content hash of the source file combined with the target profile."""
+    return hashlib.sha256(f"{_profile_tag(profile)}|{source_hash(path)}".encode()).hexdigest()[:32]
+
+
+# === Transcode ===
+def _transcode_command(src, dst, profile, has_audio):
+    w, h = profile["width"], profile["height"]
+    vf = (f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+          f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={profile['fps']},format=yuv420p")
+    cmd = [FFMPEG_BIN, "-y", "-v", "error", "-i", str(src)]
+    if has_audio:
+        cmd += ["-map", "0:v:0", "-map", "0:a:0"]
+    else:
+        # Silent track so every segment has the same stream layout
+        cmd += ["-f", "lavfi", "-i", f"anullsrc=r={profile['sample_rate']}:cl=stereo",
+                "-map", "0:v:0", "-map", "1:a:0", "-shortest"]
+    cmd += [
+        "-vf", vf,
+        "-c:v", profile["video_codec"], "-preset", profile["preset"], "-crf", str(profile["crf"]),
+        "-g", str(profile["gop"]), "-profile:v", "high",
+        "-c:a", profile["audio_codec"], "-b:a", profile["audio_bitrate"],
+        "-ar", str(profile["sample_rate"]), "-ac", str(profile["channels"]),
+        "-movflags", "+faststart", str(dst),
+    ]
+    return cmd
+
+def normalize_clip(path, has_audio=True, profile=HOUSE_PROFILE):
+    """Return the cached normalized copy of a clip, transcoding it on first use."""
+    NORMALIZED_DIR.mkdir(parents=True, exist_ok=True)
+    output_path = NORMALIZED_DIR / f"{cache_key(path, profile)}.mp4"
+
+    try:
+        os.utime(output_path)  # mtime doubles as the LRU timestamp and the eviction grace clock
+        return output_path
+    except FileNotFoundError:
+        pass
+
+    tmp_path = output_path.with_name(f"{output_path.stem}.{os.getpid()}.tmp.mp4")
+    try:
+        subprocess.run(_transcode_command(path, tmp_path, profile, has_audio),
+                       capture_output=True, text=True, check=True)
+        os.replace(tmp_path, output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    logging.info(f"🧪 Normalized {Path(path).name} → {output_path.name}")
+    return output_path
+
+def normalize_clips(paths, probes=None, workers=NORMALIZE_WORKERS, profile=HOUSE_PROFILE):
+    """Normalize clips in parallel and return the cached segment paths in input order."""
+    probes = probes or {}
+    has_audio = [probes.get(p, {}).get("has_audio", True) for p in paths]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        segments = list(pool.map(lambda args: normalize_clip(args[0], args[1], profile), zip(paths, has_audio)))
+    evict_to_budget(protect=segments)
+    return segments
+
+
+# === Eviction ===
+def _segment_stats():
+    """(path, stat) for every cached segment, skipping ones another process deleted mid-scan."""
+    stats = []
+    for f in NORMALIZED_DIR.glob("*.mp4"):
+        if f.name.endswith(".tmp.mp4"):
+            continue
+        try:
+            stats.append((f, f.stat()))
+        except FileNotFoundError:
+            continue
+    return stats
+
+def cache_usage():
+    stats = _segment_stats()
+    return sum(stat.st_size for _, stat in stats), [f for f, _ in stats]
+
+def evict_to_budget(budget=CACHE_BUDGET_BYTES, protect=(), grace=EVICTION_GRACE_SECONDS):
+    """Delete least recently used segments until the cache fits in the budget.
+
+    Segments in `protect` or used within `grace` seconds are kept even over
+    budget, so concurrent renders never lose a segment they are about to concat.
+    """
+    if not NORMALIZED_DIR.exists():
+        return 0
+    protected = {Path(p).resolve() for p in protect}
+    stats = _segment_stats()
+    total = sum(stat.st_size for _, stat in stats)
+    evicted = 0
+    cutoff = time.time() - grace
+    for f, _ in sorted(stats, key=lambda item: item[1].st_mtime):
+        if total <= budget:
+            break
+        if f.resolve() in protected:
+            continue
+        try:
+            stat = f.stat()  # Fresh stat: another process may have just touched it
+            if stat.st_mtime > cutoff:
+                continue
+            f.unlink()
+        except FileNotFoundError:
+            continue  # Another process evicted it first
+        total -= stat.st_size
+        evicted += 1
+    if evicted:
+        logging.info(f"🧹 Evicted {evicted} normalized segments; cache now {total / 1024 ** 3:.1f} GB")
+    if total > budget:
+        logging.warning(f"⚠️ Normalized cache at {total / 1024 ** 3:.1f} GB is over budget; the rest is in use")
+    return evicted
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--category-dir", help="Pre-normalize every clip in this folder")
+    parser.add_argument("--evict", action="store_true", help="Only trim the cache to its budget")
+    args = parser.parse_args()
+
+    if args.category_dir:
+        segments = normalize_clips(sorted(Path(args.category_dir).glob("*.mp4")))
+        print(f"✅ {len(segments)} clips normalized into {NORMALIZED_DIR}")
+    if args.evict:
+        evict_to_budget()
+    total, files = cache_usage() if NORMALIZED_DIR.exists() else (0, [])
+    print(f"📦 Cache: {len(files)} segments, {total / 1024 ** 3:.2f} GB of {CACHE_BUDGET_BYTES / 1024 ** 3:.0f} GB")
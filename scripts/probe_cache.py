@@ -0,0 +1,109 @@
+import os
+import json
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from ffmpeg_utils import PROBE_VERSION, probe_clip
+
+# === Settings ===
+PROBE_CACHE_FILENAME = "probe_cache.json"
+PROBE_WORKERS = int(os.environ.get("PROBE_WORKERS", os.cpu_count() or 4))
+
+
+# === Cache File ===
+def load_probe_cache(category_dir):
+    cache_path = Path(category_dir) / PROBE_CACHE_FILENAME
+    if cache_path.exists():
+        try:
+            with open(cache_path, "r") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logging.warning(f"⚠️ Rebuilding unreadable probe cache {cache_path}: {e}")
+    return {}
+
+def save_probe_cache(category_dir, cache):
+    cache_path = Path(category_dir) / PROBE_CACHE_FILENAME
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, cache_path)
+
+
+def _file_key(path):
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+def _is_fresh(entry, path):
+    size, mtime_ns = _file_key(path)
+    return (entry is not None and entry.get("size") == size and entry.get("mtime_ns") == mtime_ns
+            and entry.get("version") == PROBE_VERSION)
+
+def _probe_entry(path):
+    size, mtime_ns = _file_key(path)
+    entry = {"size": size, "mtime_ns": mtime_ns, "version": PROBE_VERSION}
+    try:
+        entry["probe"] = probe_clip(path)
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        entry["error"] = str(getattr(e, "stderr", None) or e).strip()
+    return entry
+
+
+# === Refresh & Lookup ===
+def refresh_probe_cache(category_dir, video_files=None):
+    """Probe new or changed clips in parallel and return {filename: probe} for usable clips."""
+    category_dir = Path(category_dir)
+    files = list(video_files) if video_files is not None else list(category_dir.glob("*.mp4"))
+    cache = load_probe_cache(category_dir)
+
+    stale = [f for f in files if not _is_fresh(cache.get(f.name), f)]
+    if stale:
+        logging.info(f"🔬 Probing {len(stale)} new/changed clips in {category_dir}")
+        with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as pool:
+            for path, entry in zip(stale, pool.map(_probe_entry, stale)):
+                cache[path.name] = entry
+
+    # Forget clips that were deleted since the last run
+    if video_files is None:
+        present = {f.name for f in files}
+        removed = [name for name in cache if name not in present]
+        for name in removed:
+            del cache[name]
+    else:
+        removed = []
+
+    if stale or removed:
+        save_probe_cache(category_dir, cache)
+
+    probes = {}
+    for f in files:
+        entry = cache.get(f.name, {})
+        if "probe" in entry:
+            probes[f.name] = entry["probe"]
+        else:
+            logging.warning(f"⚠️ Unprobeable clip {f.name}: {entry.get('error', 'unknown error')}")
+    return probes
+
+def get_clip_probes(video_files):
+    """Cached probes for clips that may span several category folders, keyed by path."""
+    by_dir = {}
+    for f in video_files:
+        by_dir.setdefault(f.parent, []).append(f)
+
+    probes = {}
+    for category_dir, files in by_dir.items():
+        dir_probes = refresh_probe_cache(category_dir, files)
+        for f in files:
+            if f.name in dir_probes:
+                probes[f] = dir_probes[f.name]
+    return probes
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--category-dir", required=True, help="Clip folder to (re)probe, e.g. downloads/clips/Fails")
+    args = parser.parse_args()
+
+    usable = refresh_probe_cache(args.category_dir)
+    print(f"✅ {len(usable)} clips probed in {args.category_dir}")
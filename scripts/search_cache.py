@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+from pathlib import Path
+from pytube import Search
+
+# === Settings ===
+SEARCH_CACHE_DB = Path(os.environ.get("SEARCH_CACHE_DB", "logs/search_cache.db"))
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL_HOURS", "24")) * 3600
+MAX_PAGES = 5  # Deepest result page fetched per query (~20 videos per page)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    query TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    video_ids TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (query, page)
+);
+"""
+
+
+def _connect():
+    SEARCH_CACHE_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(SEARCH_CACHE_DB), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+# === Pages ===
+class QueryPages:
+    """Result pages of one search query as lists of video IDs, served from cache while fresh.
+
+    The live pytube Search is only created when a page is missing or stale, and
+    only paged as deep as the caller asks for.
+    """
+
+    def __init__(self, query, conn, ttl=SEARCH_CACHE_TTL):
+        self.query = query
+        self.key = normalize_query(query)
+        self.conn = conn
+        self.ttl = ttl
+        self.search = None
+        self.live_pages = []
+
+    def _cached(self, page):
+        row = self.conn.execute("SELECT video_ids, fetched_at FROM pages WHERE query = ? AND page = ?",
+                                (self.key, page)).fetchone()
+        if row and time.time() - row[1] <= self.ttl:
+            return json.loads(row[0])
+        return None
+
+    def _store(self, ids):
+        self.live_pages.append(ids)
+        self.conn.execute("INSERT OR REPLACE INTO pages (query, page, video_ids, fetched_at) VALUES (?, ?, ?, ?)",
+                          (self.key, len(self.live_pages) - 1, json.dumps(ids), time.time()))
+
+    def _fetch_live(self, page):
+        """Walk the live search up to `page`; every page passed on the way is refreshed in the cache."""
+        if self.search is None:
+            self.search = Search(self.query)
+            self._store([v.video_id for v in self.search.results])
+        while len(self.live_pages) <= page:
+            seen = len(self.search.results)
+            try:
+                self.search.get_next_results()
+            except IndexError:
+                self._store([])  # No continuation: cache the end of results too
+                return []
+            self._store([v.video_id for v in self.search.results[seen:]])
+        return self.live_pages[page]
+
+    def page(self, page):
+        ids = self._cached(page)
+        if ids is None:
+            logging.info(f"🌐 Live search '{self.query}' page {page}")
+            ids = self._fetch_live(page)
+        return ids
+
+
+def collect_new_ids(queries, limit, exclude=(), max_pages=MAX_PAGES):
+    """First `limit` video IDs across queries, in query order, that aren't in exclude or already taken.
+
+    Pages each query only until `limit` is filled, so later queries and deeper
+    pages are never searched when the first pages already suffice.
+    """
+    found, seen = [], set()
+    conn = _connect()
+    try:
+        for query in queries:
+            pages = QueryPages(query, conn)
+            for page in range(max_pages):
+                try:
+                    ids = pages.page(page)
+                except Exception as e:
+                    logging.warning(f"🔍 Search failed for query '{query}' page {page}: {e}")
+                    break
+                if not ids:
+                    break
+                for video_id in ids:
+                    if video_id in seen or video_id in exclude:
+                        continue
+                    seen.add(video_id)
+                    found.append(video_id)
+                    if len(found) >= limit:
+                        return found
+    finally:
+        conn.close()
+    return found
+
+def purge_expired(ttl=SEARCH_CACHE_TTL):
+    conn = _connect()
+    try:
+        return conn.execute("DELETE FROM pages WHERE fetched_at < ?", (time.time() - ttl,)).rowcount
+    finally:
+        conn.close()
@@ -0,0 +1,80 @@
+import logging
+import tempfile
+from pathlib import Path
+import numpy as np
+from moviepy.editor import VideoFileClip
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+from moviepy.audio.io.ffmpeg_audiowriter import FFMPEG_AudioWriter
+from ffmpeg_utils import ENCODER_THREADS, mux_streams, common_output_format
+
+# === Output Settings ===
+AUDIO_FPS = 44100
+AUDIO_CHUNK = 50000
+
+
+def _fit(clip, size):
+    """Letterbox a clip into the output size, keeping its aspect ratio."""
+    if (clip.w, clip.h) == tuple(size):
+        return clip
+    scale = min(size[0] / clip.w, size[1] / clip.h)
+    resized = clip.resize(newsize=(max(2, int(clip.w * scale) // 2 * 2), max(2, int(clip.h * scale) // 2 * 2)))
+    return resized.on_color(size=size, color=(0, 0, 0), pos="center")
+
+def _write_audio(clip, audio_writer, n_samples):
+    """Write exactly n_samples of stereo int16 audio for this clip (silence if it has none)."""
+    written = 0
+    if clip.audio is not None:
+        for chunk in clip.audio.iter_chunks(chunksize=AUDIO_CHUNK, fps=AUDIO_FPS, quantize=True, nbytes=2):
+            if chunk.ndim == 1:
+                chunk = chunk[:, None]
+            if chunk.shape[1] == 1:
+                chunk = np.repeat(chunk, 2, axis=1)
+            chunk = chunk[:n_samples - written, :2]
+            if not len(chunk):
+                break
+            audio_writer.write_frames(chunk.astype(np.int16))
+            written += len(chunk)
+    while written < n_samples:
+        pad = min(AUDIO_CHUNK, n_samples - written)
+        audio_writer.write_frames(np.zeros((pad, 2), dtype=np.int16))
+        written += pad
+
+
+def stream_compile(selected_files, output_path, probes=None):
+    """Render clips one at a time into a single long-lived encoder.
+
+    Only one VideoFileClip (and its reader processes) is open at any moment, so
+    memory and file descriptors stay flat no matter how many clips are used.
+    Video and audio are encoded to temp files in lockstep, then muxed without
+    re-encoding.
+    """
+    probes = probes or {}
+    size, fps = common_output_format([probes.get(f, {}) for f in selected_files])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_tmp = Path(tmp) / "video.mp4"
+        audio_tmp = Path(tmp) / "audio.m4a"
+        video_writer = FFMPEG_VideoWriter(str(video_tmp), size, fps, codec="libx264",
+                                          preset="medium", threads=ENCODER_THREADS)
+        audio_writer = FFMPEG_AudioWriter(str(audio_tmp), AUDIO_FPS, nbytes=2, nchannels=2, codec="aac")
+        try:
+            for file in selected_files:
+                clip = VideoFileClip(str(file), audio_fps=AUDIO_FPS)
+                try:
+                    frames = 0
+                    for frame in _fit(clip, size).iter_frames(fps=fps, dtype="uint8"):
+                        video_writer.write_frame(frame)
+                        frames += 1
+                    # Match audio length to the frames actually written so A/V never drifts between clips
+                    _write_audio(clip, audio_writer, round(frames * AUDIO_FPS / fps))
+                finally:
+                    clip.close()
+                logging.info(f"🎞️ Streamed {file.name} ({frames} frames)")
+        finally:
+            video_writer.close()
+            audio_writer.close()
+
+        mux_streams(video_tmp, audio_tmp, output_path)
+
+    logging.info(f"✅ Streamed {len(selected_files)} clips into {output_path}")
+    return output_path
@@ -0,0 +1,72 @@
+import logging
+from normalize_cache import HOUSE_PROFILE
+
+# === Default Target ===
+# Matches the house render profile, so downloads never carry more pixels or frames
+# than a compilation keeps. The only definition of the default; config.json's
+# "download_profiles" holds overrides ("default" for all categories, or per category).
+DEFAULT_PROFILE = {
+    "max_height": HOUSE_PROFILE["height"],
+    "max_fps": HOUSE_PROFILE["fps"],
+    "video_codecs": ["avc1", "vp9", "av01"],  # Most preferred first; prefixes of the stream codec string
+    "audio_codecs": ["mp4a", "opus"],
+}
+
+
+def load_profile(category, profiles=None):
+    """Target profile for a category: DEFAULT_PROFILE, then config 'default' overrides, then the category's."""
+    profiles = profiles or {}
+    return {**DEFAULT_PROFILE, **profiles.get("default", {}), **profiles.get(category, {})}
+
+def _height(stream):
+    try:
+        return int((stream.resolution or "0p").rstrip("p"))
+    except ValueError:
+        return 0
+
+def _codec_rank(codec, preference):
+    codec = (codec or "").lower()
+    for rank, prefix in enumerate(preference):
+        if codec.startswith(prefix):
+            return rank
+    return len(preference)
+
+def _abr(stream):
+    try:
+        return int((stream.abr or "0kbps").rstrip("kbps"))
+    except ValueError:
+        return 0
+
+def select_streams(streams, profile=DEFAULT_PROFILE):
+    """Pick (video_stream, audio_stream) for a profile; audio_stream is None for a progressive pick.
+
+    Among streams within the height/fps caps the tallest wins, then the
+    preferred codec, then a progressive stream (one download, no mux). Only
+    streams still tied are compared by file size, since pytube may fetch it
+    with a HEAD request. If nothing fits the caps, the smallest stream is used.
+    """
+    video = [s for s in streams if s.includes_video_track]
+    if not video:
+        raise ValueError("No video streams available")
+    fitting = [s for s in video if _height(s) <= profile["max_height"] and (s.fps or 0) <= profile["max_fps"]]
+    if fitting:
+        rank = lambda s: (-_height(s), _codec_rank(s.video_codec, profile["video_codecs"]), not s.is_progressive)
+        top = min(map(rank, fitting))
+        tied = [s for s in fitting if rank(s) == top]
+        best = tied[0] if len(tied) == 1 else min(tied, key=lambda s: s.filesize or 0)
+    else:
+        best = min(video, key=lambda s: (_height(s), s.fps or 0, not s.is_progressive))
+        logging.info(f"📐 No stream within {profile['max_height']}p/{profile['max_fps']}fps; using {describe(best)}")
+    if best.includes_audio_track:
+        return best, None
+
+    audio = [s for s in streams if s.includes_audio_track and not s.includes_video_track]
+    if not audio:
+        raise ValueError("No audio stream to pair with the adaptive video stream")
+    best_audio = min(audio, key=lambda s: (_codec_rank(s.audio_codec, profile["audio_codecs"]), -_abr(s)))
+    return best, best_audio
+
+def describe(stream):
+    if stream.includes_video_track:
+        return f"{stream.resolution}@{stream.fps} {stream.video_codec} ({stream.subtype})"
+    return f"{stream.abr} {stream.audio_codec} ({stream.subtype})"
@@ -1,19 +1,39 @@
 import os
 import json
+import time
 import random
 import logging
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
+from ffmpeg_utils import FFMPEG_BIN, probe_clip
+import gpt4all_daemon
 
 # === Setup ===
 THUMBNAIL_DIR = Path("downloads/thumbnails")
 TEMPLATE_DIR = Path("assets/templates")
 FONT_PATH = Path("assets/fonts/Arial_Bold.ttf")
 IMAGE_SIZE = (1280, 720)
-FONT_SIZE = 40
+FONT_SIZE = 40  # Smallest size the title is allowed to shrink to
+MAX_FONT_SIZE = 120
+TEXT_BOX = (0.9, 0.4)  # Title may use up to 90% of the width and 40% of the height
+THUMBNAIL_WORKERS = os.cpu_count() or 2
+
+# === JPEG Budget ===
+MAX_THUMBNAIL_BYTES = 2 * 1024 * 1024  # YouTube rejects custom thumbnails above 2 MB
+JPEG_QUALITY_RANGE = (40, 95)
 THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
 
+# === Frame Sampling ===
+FRAME_CANDIDATES = 36
+SCORE_BATCH = 8
+SCORE_WEIGHTS = {"sharpness": 0.35, "colorfulness": 0.25, "contrast": 0.2, "skin": 0.2}
+
 # Logging
 logging.basicConfig(filename="logs/thumbnail_log.txt", level=logging.INFO, format="%(asctime)s - %(message)s")
 
@@ -33,51 +53,238 @@ def generate_title_with_ai(category, seed_keywords):
     prompt = f"Create a compelling YouTube thumbnail title for the category '{category}' using these keywords: {', '.join(seed_keywords)}"
     if use_gpt4all:
         try:
-            from gpt4all import GPT4All
-            gpt = GPT4All("ggml-gpt4all-j-v1.3-groovy")
-            return gpt.prompt(prompt).strip()
-        except Exception as e:
+            return gpt4all_daemon.generate(prompt)
+        except gpt4all_daemon.GPT4AllUnavailable as e:
             logging.warning(f"⚠️ GPT fallback: {e}")
     return f"Top {category} Moments!"
 
+def _keyframe_batches(video_path, count=FRAME_CANDIDATES):
+    """Decode only keyframes, spaced evenly over the video, as batches of RGB arrays at IMAGE_SIZE."""
+    duration = probe_clip(video_path)["duration"]
+    interval = max(duration / count, 1.0)
+    w, h = IMAGE_SIZE
+    vf = (f"select='isnan(prev_selected_t)+gte(t-prev_selected_t,{interval:.3f})',"
+          f"scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h}")
+    proc = subprocess.Popen(
+        [FFMPEG_BIN, "-v", "error", "-skip_frame", "nokey", "-i", str(video_path), "-an",
+         "-vf", vf, "-vsync", "vfr", "-frames:v", str(count), "-pix_fmt", "rgb24", "-f", "rawvideo", "pipe:1"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    frame_bytes = w * h * 3
+    try:
+        while True:
+            data = proc.stdout.read(frame_bytes * SCORE_BATCH)
+            n = len(data) // frame_bytes
+            if n == 0:
+                break
+            yield np.frombuffer(data[:n * frame_bytes], dtype=np.uint8).reshape(n, h, w, 3)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+def score_frames(frames):
+    """Per-frame metrics for a (n, h, w, 3) batch, computed on a 4x-downsampled copy."""
+    small = frames[:, ::4, ::4].astype(np.float32)
+    r, g, b = small[..., 0], small[..., 1], small[..., 2]
+    gray = 0.299 * r + 0.587 * g + 0.114 * b
+
+    lap = (gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1] + gray[:, 1:-1, :-2] + gray[:, 1:-1, 2:]
+           - 4 * gray[:, 1:-1, 1:-1])
+    rg = r - g
+    yb = 0.5 * (r + g) - b
+    colorfulness = (np.sqrt(rg.std(axis=(1, 2)) ** 2 + yb.std(axis=(1, 2)) ** 2)
+                    + 0.3 * np.sqrt(rg.mean(axis=(1, 2)) ** 2 + yb.mean(axis=(1, 2)) ** 2))
+
+    # Skin-tone share in YCrCb as a cheap stand-in for "has a face/person"
+    cr = 128 + 0.5 * r - 0.419 * g - 0.081 * b
+    cb = 128 - 0.169 * r - 0.331 * g + 0.5 * b
+    skin = ((cr > 133) & (cr < 173) & (cb > 77) & (cb < 127)).mean(axis=(1, 2))
+
+    brightness = gray.mean(axis=(1, 2))
+    return {
+        "sharpness": lap.var(axis=(1, 2)),
+        "colorfulness": colorfulness,
+        "contrast": gray.std(axis=(1, 2)),
+        "skin": np.minimum(skin, 0.3),
+        "usable": (brightness > 40) & (brightness < 215),  # drop black/white transition frames
+    }
+
+def pick_best_frame(video_path, count=FRAME_CANDIDATES):
+    """Return the highest-scoring keyframe of the video as a PIL image, or None."""
+    batches, metrics = [], []
+    for frames in _keyframe_batches(video_path, count):
+        batches.append(frames)
+        metrics.append(score_frames(frames))
+    if not batches:
+        return None
+
+    merged = {k: np.concatenate([m[k] for m in metrics]) for k in metrics[0]}
+    total = np.zeros(len(merged["usable"]), dtype=np.float32)
+    for name, weight in SCORE_WEIGHTS.items():
+        peak = merged[name].max()
+        if peak > 0:
+            total += weight * merged[name] / peak
+    total[~merged["usable"]] -= 1.0
+
+    best = int(total.argmax())
+    for frames in batches:
+        if best < len(frames):
+            return Image.fromarray(frames[best])
+        best -= len(frames)
+    return None
+
 def sanitize_filename(text):
     return "".join(c if c.isalnum() or c in "-_" else "_" for c in text)
 
-def generate_thumbnail(title, category):
-    color = CATEGORY_COLORS.get(category, (255, 255, 255))
+# === Cached Assets ===
+@lru_cache(maxsize=32)
+def _load_template(category):
+    """Category template pre-resized to IMAGE_SIZE, or None. Callers must copy() before drawing."""
     template_path = TEMPLATE_DIR / f"{category.replace(' ', '_').lower()}.jpg"
+    if not template_path.exists():
+        return None
+    return Image.open(template_path).convert("RGB").resize(IMAGE_SIZE)
 
-    if template_path.exists():
-        background = Image.open(template_path).resize(IMAGE_SIZE)
-    else:
-        background = Image.new("RGB", IMAGE_SIZE, color=color)
-
-    draw = ImageDraw.Draw(background)
+@lru_cache(maxsize=128)
+def _load_font(size):
     try:
-        font = ImageFont.truetype(str(FONT_PATH), FONT_SIZE)
+        return ImageFont.truetype(str(FONT_PATH), size)
     except Exception as e:
         logging.warning(f"⚠️ Font load failed: {e}")
-        font = ImageFont.load_default()
+        return ImageFont.load_default(size)
 
-    text_w, text_h = draw.textsize(title, font=font)
-    text_position = ((IMAGE_SIZE[0] - text_w) // 2, (IMAGE_SIZE[1] - text_h) // 2)
-    draw.text(text_position, title, fill="black", font=font)
+def fit_text(draw, text, stroke_width=0):
+    """Largest font (FONT_SIZE..MAX_FONT_SIZE) whose textbbox fits TEXT_BOX; binary search on size."""
+    max_w, max_h = IMAGE_SIZE[0] * TEXT_BOX[0], IMAGE_SIZE[1] * TEXT_BOX[1]
+    low, high = FONT_SIZE, MAX_FONT_SIZE
+    best = FONT_SIZE
+    while low <= high:
+        mid = (low + high) // 2
+        left, top, right, bottom = draw.textbbox((0, 0), text, font=_load_font(mid), stroke_width=stroke_width)
+        if right - left <= max_w and bottom - top <= max_h:
+            best, low = mid, mid + 1
+        else:
+            high = mid - 1
+    font = _load_font(best)
+    return font, draw.textbbox((0, 0), text, font=font, stroke_width=stroke_width)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{sanitize_filename(category)}_{timestamp}.jpg"
-    output_path = THUMBNAIL_DIR / filename
-    background.save(output_path)
+
+def encode_jpeg(image, max_bytes=MAX_THUMBNAIL_BYTES):
+    """Highest-quality progressive, Huffman-optimized JPEG that fits max_bytes, encoded in memory.
+
+    Returns (jpeg_bytes, quality). Tries the top quality first since it usually
+    fits, then binary-searches the quality range.
+    """
+    def encode(quality):
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+        return buffer.getvalue()
+
+    low, high = JPEG_QUALITY_RANGE
+    data = encode(high)
+    if len(data) <= max_bytes:
+        return data, high
+
+    best = None
+    high -= 1
+    while low <= high:
+        mid = (low + high) // 2
+        candidate = encode(mid)
+        if len(candidate) <= max_bytes:
+            best, low = (candidate, mid), mid + 1
+        else:
+            high = mid - 1
+    if best is None:
+        quality = JPEG_QUALITY_RANGE[0]
+        logging.error(f"❌ Thumbnail exceeds {max_bytes} bytes even at quality {quality}")
+        return encode(quality), quality
+    return best
+
+
+def generate_thumbnail(title, category, video_path=None, output_path=None):
+    color = CATEGORY_COLORS.get(category, (255, 255, 255))
+
+    background = None
+    if video_path:
+        try:
+            background = pick_best_frame(video_path)
+        except Exception as e:
+            logging.warning(f"⚠️ Frame sampling failed, using template: {e}")
+    text_style = {"fill": "white", "stroke_width": 3, "stroke_fill": "black"} if background else {"fill": "black"}
+
+    if background is None:
+        template = _load_template(category)
+        background = template.copy() if template is not None else Image.new("RGB", IMAGE_SIZE, color=color)
+
+    draw = ImageDraw.Draw(background)
+    font, (left, top, right, bottom) = fit_text(draw, title, text_style.get("stroke_width", 0))
+    text_position = ((IMAGE_SIZE[0] - (right - left)) // 2 - left, (IMAGE_SIZE[1] - (bottom - top)) // 2 - top)
+    draw.text(text_position, title, font=font, **text_style)
+
+    if output_path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = THUMBNAIL_DIR / f"{sanitize_filename(category)}_{timestamp}.jpg"
+    output_path = Path(output_path)
+    started = time.perf_counter()
+    data, quality = encode_jpeg(background.convert("RGB"))
+    encode_ms = (time.perf_counter() - started) * 1000
+    with open(output_path, "wb") as f:
+        f.write(data)
     logging.info(f"✅ Thumbnail generated: {output_path}")
+    logging.info(f"📏 Thumbnail encode: {output_path.name} size={len(data)}B quality={quality} time={encode_ms:.1f}ms")
     return title, output_path
 
+
+# === Batch Rendering ===
+def _render_batch_item(args):
+    title, category, video_path, output_path = args
+    try:
+        return generate_thumbnail(title, category, video_path=video_path, output_path=output_path)
+    except Exception as e:
+        logging.error(f"❌ Thumbnail failed for '{title}' ({category}): {e}")
+        return title, None
+
+def generate_thumbnails(items, workers=THUMBNAIL_WORKERS):
+    """Render many thumbnails in one call.
+
+    items are (title, category) or (title, category, video_path) tuples. Work is
+    fanned out over a process pool in chunks so each worker reuses its template
+    and font caches. Returns [(title, output_path or None)] in input order.
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    jobs = []
+    for i, item in enumerate(items):
+        title, category = item[0], item[1]
+        video_path = item[2] if len(item) > 2 else None
+        output_path = THUMBNAIL_DIR / f"{sanitize_filename(category)}_{timestamp}_{i:04d}.jpg"
+        jobs.append((title, category, video_path, output_path))
+
+    if workers <= 1 or len(jobs) <= 1:
+        return [_render_batch_item(job) for job in jobs]
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_batch_item, jobs, chunksize=chunksize))
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
-    parser.add_argument("--category", required=True, help="Video category")
+    parser.add_argument("--category", help="Video category")
     parser.add_argument("--keywords", nargs="*", default=[], help="Seed keywords for title")
+    parser.add_argument("--video", default=None, help="Compiled video to pull the background frame from")
+    parser.add_argument("--batch-file", default=None,
+                        help="JSON list of {title, category[, video]} objects to render in one run")
     args = parser.parse_args()
 
-    title = generate_title_with_ai(args.category, args.keywords)
-    _, output = generate_thumbnail(title, args.category)
-    print(f"✅ Generated thumbnail at {output}")
+    if not args.batch_file and not args.category:
+        parser.error("--category is required unless --batch-file is given")
+
+    if args.batch_file:
+        with open(args.batch_file, "r") as f:
+            entries = json.load(f)
+        results = generate_thumbnails([(e["title"], e["category"], e.get("video")) for e in entries])
+        print(f"✅ Generated {sum(1 for _, out in results if out)}/{len(results)} thumbnails")
+    else:
+        title = generate_title_with_ai(args.category, args.keywords)
+        _, output = generate_thumbnail(title, args.category, video_path=args.video)
+        print(f"✅ Generated thumbnail at {output}")
 
@@ -1,17 +1,26 @@
 import os
 import random
 import logging
-import json
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from moviepy.editor import VideoFileClip, concatenate_videoclips
+from ffmpeg_utils import ENCODER_THREADS, can_stream_copy, concat_stream_copy
+from probe_cache import refresh_probe_cache, get_clip_probes
+from clip_selector import select_clip_set, ClipSelectionError
+from composition_index import CompositionIndex
+import history_store
+import media_catalog
+from normalize_cache import normalize_clips
+from stream_compiler import stream_compile
+from clip_fingerprint import FingerprintIndex, refresh_fingerprints
+from fused_render import fused_render
 
 # === Paths & Configs ===
 CLIPS_DIR = Path("downloads/clips")
 OUTPUT_DIR = Path("downloads/processed_videos")
 LOGS_DIR = Path("logs")
-HISTORY_FILE = LOGS_DIR / "clip_usage_history.json"
-COMPOSITION_HISTORY_FILE = LOGS_DIR / "video_clip_compositions.json"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -27,37 +36,45 @@ MIN_DURATION = 600  # 10 minutes
 MAX_DURATION = 1800  # 30 minutes
 RECENT_VIDEO_WINDOW = 15
 MAX_REPEATED_GROUP_CLIPS = 3
+COMPOSITION_HISTORY_LIMIT = 2000  # Per category; overlap checks go through CompositionIndex, so a long history stays cheap
+
+# === Render Modes ===
+# "auto" stream-copies when every selected clip shares one stream layout, else falls back to "stream"
+# "stream" re-encodes with one clip open at a time (flat memory / fd use)
+# "normalize" transcodes each clip once to the house profile (cached) and stream-copies the segments
+# "fused" encodes once through one ffmpeg filtergraph: concat + watermark + EBU R128 loudnorm
+# "moviepy" opens every clip and composites them with concatenate_videoclips (legacy)
+RENDER_MODES = ("auto", "stream", "normalize", "fused", "moviepy")
 
 
 # === Clip History ===
+# Usage and compositions live in the SQLite store (logs/clip_history.db); the legacy
+# JSON files are only read once by history_store.migrate_json.
 def load_usage_history():
-    if HISTORY_FILE.exists():
-        with open(HISTORY_FILE, "r") as f:
-            return json.load(f)
-    return {}
-
-def save_usage_history(history):
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(history, f, indent=2)
+    return history_store.load_usage_history()
 
 def update_clip_history(used_clips, history):
+    history_store.record_usage(used_clips, max_uses=RECENT_VIDEO_WINDOW)
     for clip in used_clips:
         history.setdefault(clip, []).append(len(history.get(clip, [])) + 1)
-    save_usage_history(history)
 
 
 # === Composition Grouping History ===
-def load_compositions():
-    if COMPOSITION_HISTORY_FILE.exists():
-        with open(COMPOSITION_HISTORY_FILE, "r") as f:
-            return json.load(f)
-    return []
+def load_compositions(category=None):
+    return history_store.load_compositions(limit=COMPOSITION_HISTORY_LIMIT, category=category)
+
+def save_composition(clip_names, category=None):
+    return history_store.save_composition(clip_names, limit=COMPOSITION_HISTORY_LIMIT, category=category)
 
-def save_composition(clip_names):
-    compositions = load_compositions()
-    compositions.append(clip_names)
-    with open(COMPOSITION_HISTORY_FILE, "w") as f:
-        json.dump(compositions[-RECENT_VIDEO_WINDOW:], f, indent=2)  # Keep recent only
+def record_compilation(used_clips, category=None):
+    """Store the composition and clip usage in one transaction."""
+    return history_store.record_compilation(used_clips, max_uses=RECENT_VIDEO_WINDOW,
+                                            limit=COMPOSITION_HISTORY_LIMIT, category=category)
+
+def release_compilation(comp_id):
+    """Give back the clip uses recorded for a compilation whose render failed."""
+    history_store.release_compilation(comp_id)
+    logging.info(f"↩️ Released clip usage of unrendered composition {comp_id}")
 
 
 def is_clip_usable(clip_name, history, recent_limit=RECENT_VIDEO_WINDOW):
@@ -68,20 +85,15 @@ def is_clip_usable(clip_name, history, recent_limit=RECENT_VIDEO_WINDOW):
 
 
 def has_repeated_grouping(candidate_clips, past_compositions):
-    for comp in past_compositions:
-        overlap = len(set(comp) & set(candidate_clips))
-        if overlap > MAX_REPEATED_GROUP_CLIPS:
-            return True
-    return False
+    if not isinstance(past_compositions, CompositionIndex):
+        past_compositions = CompositionIndex(past_compositions)
+    return past_compositions.has_repeated_grouping(candidate_clips, MAX_REPEATED_GROUP_CLIPS)
 
 
 # === Load & Filter ===
 def load_clip_metadata(category_dir):
-    metadata_path = category_dir / "clip_metadata.json"
-    if metadata_path.exists():
-        with open(metadata_path, "r") as f:
-            return json.load(f)
-    return {}
+    media_catalog.ingest_clip_metadata(category_dir)  # Picks up hand-edited clip_metadata.json when it changes
+    return media_catalog.clip_metadata(category_dir.name)
 
 def load_clips(category: str):
     category_dir = CLIPS_DIR / category
@@ -96,67 +108,216 @@ def load_clips(category: str):
     filtered = [vf for vf in video_files if metadata.get(vf.name, {}).get("category") == category]
     if not filtered:
         raise ValueError(f"No matching clips with correct metadata found for category: {category}")
+
+    # Probe once per new/changed file; corrupt clips drop out here instead of at render time
+    probes = refresh_probe_cache(category_dir, filtered)
+    filtered = [vf for vf in filtered if vf.name in probes]
+    if not filtered:
+        raise ValueError(f"No readable clips found for category: {category}")
+
+    refresh_fingerprints(category_dir, filtered, probes)
     return filtered
 
 
 # === Compile Clips into Video ===
-def compile_clips(video_files):
-    history = load_usage_history()
-    past_compositions = load_compositions()
+def select_clips(video_files, probes=None, record=True, history=None, past_compositions=None, fingerprints=None):
+    """Pick usable clips that fill the duration window and record their usage.
+
+    history, past_compositions and the category's fingerprints can be passed in
+    to reuse already-loaded state across several selections; history and
+    past_compositions are then updated in place.
+    """
+    category = video_files[0].parent.name if video_files else None  # Clips live in CLIPS_DIR/<category>
+    history = history if history is not None else load_usage_history()
+    if past_compositions is None:
+        past_compositions = CompositionIndex(load_compositions(category))
+    probes = probes if probes is not None else get_clip_probes(video_files)
+
+    usable = [f for f in video_files if f in probes and is_clip_usable(f.name, history)]
+    if usable:
+        # The same moment scraped from several uploads should appear at most once per compilation
+        fingerprints = fingerprints if fingerprints is not None else FingerprintIndex.load(usable[0].parent)
+        unique = set(fingerprints.dedupe([f.name for f in usable]))
+        usable = [f for f in usable if f.name in unique]
+    candidates = [(f.name, probes[f]["duration"]) for f in usable]
+    try:
+        used_clips = select_clip_set(candidates, MIN_DURATION, MAX_DURATION,
+                                     past_compositions, MAX_REPEATED_GROUP_CLIPS)
+    except ClipSelectionError as e:
+        raise RuntimeError(f"🚫 No valid compilation: {e}") from e
 
-    clips = []
-    used_clips = []
-    total_duration = 0
+    if has_repeated_grouping(used_clips, past_compositions):
+        raise RuntimeError("🚫 Too many previously grouped clips reused together. Skipping.")
 
-    for file in video_files:
-        if not is_clip_usable(file.name, history):
-            continue
+    by_name = {f.name: f for f in usable}
+    selected_files = [by_name[name] for name in used_clips]
 
-        try:
-            clip = VideoFileClip(str(file))
-            clip_duration = clip.duration
+    if record:
+        record_compilation(used_clips, category)
+    past_compositions.add(used_clips)
+    for clip in used_clips:
+        history.setdefault(clip, []).append(len(history.get(clip, [])) + 1)
 
-            if total_duration + clip_duration > MAX_DURATION:
-                continue
+    return selected_files, used_clips
 
-            clips.append(clip)
-            used_clips.append(file.name)
-            total_duration += clip_duration
+def open_clips(selected_files):
+    return [VideoFileClip(str(file)) for file in selected_files]
 
-            if MIN_DURATION <= total_duration <= MAX_DURATION:
-                break
+def compile_clips(video_files):
+    selected_files, used_clips = select_clips(video_files)
+    return concatenate_videoclips(open_clips(selected_files), method="compose"), used_clips
 
-        except Exception as e:
-            logging.warning(f"⚠️ Skipping corrupt clip {file.name}: {e}")
 
-    if total_duration < MIN_DURATION:
-        raise RuntimeError(f"Final video too short: {total_duration/60:.1f} minutes. Minimum is 10.")
+# === Save Final Video ===
+def build_output_path(category: str, batch_index=None):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    suffix = f"_{batch_index:02d}" if batch_index is not None else ""
+    return OUTPUT_DIR / f"{category.replace(' ', '_').lower()}_compilation_{timestamp}{suffix}.mp4"
 
-    if has_repeated_grouping(used_clips, past_compositions):
-        raise RuntimeError("🚫 Too many previously grouped clips reused together. Skipping.")
+def save_compilation(category: str, final_clip, used_clips, output_path=None):
+    output_path = output_path or build_output_path(category)
+    final_clip.write_videofile(str(output_path), codec="libx264", audio_codec="aac", threads=ENCODER_THREADS)
+    logging.info(f"✅ Video saved: {output_path}")
+    logging.info(f"🎞️ Clips used: {used_clips}")
 
-    update_clip_history(used_clips, history)
-    save_composition(used_clips)
+def save_stream_copy(selected_files, used_clips, output_path, probes):
+    """Concatenate clips without re-encoding. Returns False when the clips can't be stream-copied."""
+    if not can_stream_copy([probes[file] for file in selected_files]):
+        logging.info("🔀 Clip stream layouts differ, falling back to re-encode.")
+        return False
 
-    return concatenate_videoclips(clips, method="compose"), used_clips
+    try:
+        concat_stream_copy(selected_files, output_path)
+    except (subprocess.CalledProcessError, OSError) as e:
+        logging.warning(f"⚠️ Stream copy failed, falling back to re-encode: {getattr(e, 'stderr', e)}")
+        Path(output_path).unlink(missing_ok=True)
+        return False
 
+    logging.info(f"✅ Video saved: {output_path}")
+    logging.info(f"🎞️ Clips used: {used_clips}")
+    return True
 
-# === Save Final Video ===
-def save_compilation(category: str, final_clip, used_clips):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_path = OUTPUT_DIR / f"{category.replace(' ', '_').lower()}_compilation_{timestamp}.mp4"
-    final_clip.write_videofile(str(output_path), codec="libx264", audio_codec="aac")
+def save_normalized(selected_files, used_clips, output_path, probes):
+    """Concatenate cached house-profile segments; only clips not seen before get encoded."""
+    segments = normalize_clips(selected_files, probes)
+    concat_stream_copy(segments, output_path)
     logging.info(f"✅ Video saved: {output_path}")
     logging.info(f"🎞️ Clips used: {used_clips}")
 
 
 # === Run Processing ===
-def process_category(category: str):
+def plan_category(category: str):
+    """Dry-run selection; nothing is recorded or rendered.
+
+    load_clips still probes and fingerprints clips that are new or changed,
+    which decodes a few frames of each; known clips are served from the caches.
+    """
+    video_files = load_clips(category)
+    random.shuffle(video_files)
+    probes = get_clip_probes(video_files)
+    selected_files, _ = select_clips(video_files, probes, record=False)
+    return [(f.name, probes[f]["duration"]) for f in selected_files]
+
+def plan_compilations(category: str, count: int, record=True):
+    """Plan up to `count` compilations with no clip shared between them.
+
+    Clip listing, probes, usage history, the composition index and the
+    fingerprint index are loaded once and reused for every plan. With record,
+    each plan's usage is reserved right away; release_compilation gives it
+    back if the render fails. Returns [(selected_files, used_clips, probes, comp_id)].
+    """
+    video_files = load_clips(category)
+    random.shuffle(video_files)
+    probes = get_clip_probes(video_files)
+    history = load_usage_history()
+    past_compositions = CompositionIndex(load_compositions(category))
+    fingerprints = FingerprintIndex.load(CLIPS_DIR / category)
+
+    plans = []
+    pool = video_files
+    for _ in range(count):
+        try:
+            selected_files, used_clips = select_clips(pool, probes, False, history, past_compositions, fingerprints)
+        except RuntimeError as e:
+            if not plans:
+                raise
+            logging.warning(f"⚠️ Clip pool exhausted after {len(plans)} of {count} compilations: {e}")
+            break
+        try:
+            comp_id = record_compilation(used_clips, category) if record else None
+        except history_store.UsageLimitError as e:
+            if not plans:
+                raise
+            logging.warning(f"🔒 Stopped after {len(plans)} of {count} compilations, clip claimed by a concurrent run: {e}")
+            break
+        plans.append((selected_files, used_clips, {f: probes[f] for f in selected_files}, comp_id))
+        taken = set(used_clips)
+        pool = [f for f in pool if f.name not in taken]
+    return plans
+
+def render_compilation(category: str, selected_files, used_clips, probes, render_mode="auto", output_path=None,
+                       watermark_text=None):
+    output_path = output_path or build_output_path(category)
+
+    if render_mode == "fused":
+        # Watermarked output needs no separate generate_watermark pass afterwards
+        fused_render(selected_files, output_path, probes, watermark_text or f"{category} Compilation")
+        logging.info(f"✅ Video saved: {output_path}")
+        logging.info(f"🎞️ Clips used: {used_clips}")
+        return output_path
+
+    if render_mode == "normalize":
+        save_normalized(selected_files, used_clips, output_path, probes)
+        return output_path
+
+    if render_mode == "auto" and save_stream_copy(selected_files, used_clips, output_path, probes):
+        return output_path
+
+    if render_mode in ("auto", "stream"):
+        stream_compile(selected_files, output_path, probes)
+        logging.info(f"✅ Video saved: {output_path}")
+        logging.info(f"🎞️ Clips used: {used_clips}")
+        return output_path
+
+    final_clip = concatenate_videoclips(open_clips(selected_files), method="compose")
+    save_compilation(category, final_clip, used_clips, output_path)
+    return output_path
+
+def process_category(category: str, render_mode: str = "auto", watermark_text=None):
     logging.info(f"🎬 Processing category: {category}")
     video_files = load_clips(category)
     random.shuffle(video_files)
-    final_clip, used_clips = compile_clips(video_files)
-    save_compilation(category, final_clip, used_clips)
+    probes = get_clip_probes(video_files)
+    selected_files, used_clips = select_clips(video_files, probes, record=False)
+    comp_id = record_compilation(used_clips, category)
+    try:
+        return render_compilation(category, selected_files, used_clips, probes, render_mode,
+                                  watermark_text=watermark_text)
+    except Exception:
+        release_compilation(comp_id)
+        raise
+
+def process_category_batch(category: str, count: int, render_mode: str = "auto", jobs=None, watermark_text=None):
+    """Plan `count` compilations in one pass and render them concurrently."""
+    logging.info(f"🎬 Batch processing category: {category} ({count} compilations)")
+    plans = plan_compilations(category, count)
+    jobs = jobs or max(1, (os.cpu_count() or 1) // ENCODER_THREADS)
+
+    outputs = []
+    with ProcessPoolExecutor(max_workers=min(jobs, len(plans))) as pool:
+        futures = [
+            pool.submit(render_compilation, category, selected_files, used_clips, probes, render_mode,
+                        build_output_path(category, i), watermark_text)
+            for i, (selected_files, used_clips, probes, _) in enumerate(plans)
+        ]
+        for future, (_, _, _, comp_id) in zip(futures, plans):
+            try:
+                outputs.append(future.result())
+            except Exception as e:
+                logging.error(f"💥 Render failed in batch for {category}: {e}")
+                release_compilation(comp_id)
+    logging.info(f"✅ Rendered {len(outputs)}/{len(plans)} compilations for {category}")
+    return outputs
 
 
 # === Entry Point ===
@@ -164,9 +325,23 @@ if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--category", required=True, help="Video category to process")
+    parser.add_argument("--render-mode", choices=RENDER_MODES, default="auto", help="How to build the compilation")
+    parser.add_argument("--plan-only", action="store_true", help="Print the clip selection without rendering")
+    parser.add_argument("--count", type=int, default=1, help="Number of non-overlapping compilations to render")
+    parser.add_argument("--jobs", type=int, default=None, help="Concurrent renders for --count (default: cores / ENCODER_THREADS)")
+    parser.add_argument("--watermark-text", default=None, help="Watermark for --render-mode fused (default: '<category> Compilation')")
     args = parser.parse_args()
 
     try:
-        process_category(args.category)
+        if args.plan_only:
+            plan = plan_category(args.category)
+            for name, duration in plan:
+                print(f"{duration:8.1f}s  {name}")
+            print(f"✅ {len(plan)} clips, {sum(d for _, d in plan)/60:.1f} minutes")
+        elif args.count > 1:
+            process_category_batch(args.category, args.count, render_mode=args.render_mode, jobs=args.jobs,
+                                   watermark_text=args.watermark_text)
+        else:
+            process_category(args.category, render_mode=args.render_mode, watermark_text=args.watermark_text)
     except Exception as e:
         logging.error(f"💥 Processing failed: {e}")
@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from pathlib import Path
+
+# === Paths ===
+REGISTRY_DIR = Path("logs/video_registry")
+LEGACY_FILES = {
+    "used": Path("config/used_videos.json"),
+    "processed": Path("config/processed_videos.json"),
+}
+DEFAULT_PARTITION = "uncategorized"
+REFRESH_INTERVAL = 0.5  # Seconds between tail reloads triggered by membership misses
+
+
+def _partition_name(category):
+    return (category or DEFAULT_PARTITION).replace(" ", "_").lower()
+
+
+class VideoRegistry:
+    """Set of video IDs of one kind (scraped, used, processed), partitioned per category on disk.
+
+    Each partition is an append-only file with one ID per line. Memory holds
+    the union as a set; other processes' appends are picked up by reading
+    each file from the last offset, so a reload costs only the new lines.
+    """
+
+    def __init__(self, kind, registry_dir=REGISTRY_DIR):
+        self.kind = kind
+        self.dir = Path(registry_dir) / kind
+        self.ids = set()
+        self.partitions = {}  # partition name -> set of IDs
+        self.offsets = {}  # partition file -> bytes consumed
+        self.last_refresh = 0.0
+        self.lock = threading.Lock()
+        try:
+            self.dir.mkdir(parents=True)
+        except FileExistsError:
+            pass
+        else:
+            self._import_legacy()  # Only the process that created the registry imports, so IDs aren't doubled
+        self.refresh()
+
+    def _path(self, category):
+        return self.dir / f"{_partition_name(category)}.ids"
+
+    def refresh(self):
+        """Read whatever was appended to any partition since the last refresh."""
+        with self.lock:
+            for path in self.dir.glob("*.ids"):
+                offset = self.offsets.get(path, 0)
+                if path.stat().st_size <= offset:
+                    continue
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read()
+                complete = data.rfind(b"\n") + 1  # Leave a half-written last line for next time
+                new_ids = data[:complete].decode().split()
+                self.partitions.setdefault(path.stem, set()).update(new_ids)
+                self.ids.update(new_ids)
+                self.offsets[path] = offset + complete
+            self.last_refresh = time.monotonic()
+
+    def __contains__(self, video_id):
+        if video_id in self.ids:
+            return True
+        if time.monotonic() - self.last_refresh >= REFRESH_INTERVAL:
+            self.refresh()
+        return video_id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, video_id, category=None):
+        """Append an ID to its category partition; a no-op if it's already registered there."""
+        partition = _partition_name(category)
+        if video_id in self.partitions.get(partition, ()):
+            return
+        self._append(self._path(category), [video_id])
+        with self.lock:
+            self.partitions.setdefault(partition, set()).add(video_id)
+            self.ids.add(video_id)
+
+    def _append(self, path, video_ids):
+        # O_APPEND plus an exclusive lock keeps lines whole when several scrapers write at once
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, "".join(f"{v}\n" for v in video_ids).encode())
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def category_ids(self, category):
+        self.refresh()
+        return set(self.partitions.get(_partition_name(category), ()))
+
+    def _import_legacy(self):
+        legacy = LEGACY_FILES.get(self.kind)
+        if not legacy or not legacy.exists():
+            return
+        try:
+            data = json.loads(legacy.read_text())
+        except ValueError as e:
+            logging.warning(f"⚠️ Skipping unreadable {legacy}: {e}")
+            return
+        by_category = data if isinstance(data, dict) else {DEFAULT_PARTITION: data}
+        for category, video_ids in by_category.items():
+            if video_ids:
+                self._append(self._path(category), list(video_ids))
+        logging.info(f"📦 Imported {legacy} into the {self.kind} registry")
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+def get_registry(kind):
+    """Process-wide registry instance for a kind, so the ID set is loaded once."""
+    with _registries_lock:
+        if kind not in _registries:
+            _registries[kind] = VideoRegistry(kind)
+        return _registries[kind]
@@ -1,14 +1,19 @@
 import os
-import json
 import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from pytube import YouTube, Search
+from pytube import YouTube
 from config_manager import get_scraped_videos, save_scraped_video, load_config
+from download_engine import download_url, DownloadError, DOWNLOAD_WORKERS
+from ffmpeg_utils import mux_streams
+from stream_selector import load_profile, select_streams, describe
+import media_catalog
+from search_cache import collect_new_ids
 
 # === Paths ===
 DOWNLOAD_DIR = Path("downloads/full_videos")
-METADATA_LOG = Path("logs/clip_metadata.json")
 LOG_FILE = Path("logs/scraper_log.txt")
 
 # === Logging ===
@@ -22,25 +27,58 @@ logging.basicConfig(
 # === Load Config ===
 config = load_config()
 CATEGORY_QUERIES = config.get("search_queries", {})
+DOWNLOAD_PROFILES = config.get("download_profiles", {})
 
 # === Ensure folders ===
 DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 # === Core Functions ===
-def fetch_youtube_videos(category, limit=10):
-    """Search and return YouTube video objects for a given category."""
+class _ExcludeSet:
+    """Membership view over several ID collections without copying them."""
+
+    def __init__(self, *collections):
+        self.collections = collections
+
+    def __contains__(self, video_id):
+        return any(video_id in c for c in self.collections)
+
+_claimed_ids = set()  # IDs already handed out in this process, so categories never share a video
+
+def fetch_youtube_videos(category, limit=10, exclude=None):
+    """Return up to `limit` YouTube objects for a category, skipping already scraped videos.
+
+    Search pages come from search_cache; video objects are only built for the
+    IDs that survive dedup across queries and categories.
+    """
     queries = CATEGORY_QUERIES.get(category, [])
-    results = []
-    for query in queries:
-        try:
-            search = Search(query)
-            results.extend(search.results[:limit])
-        except Exception as e:
-            logging.warning(f"🔍 Search failed for query '{query}': {e}")
-    return results[:limit]
+    exclude = get_scraped_videos() if exclude is None else exclude
+    video_ids = collect_new_ids(queries, limit, exclude=_ExcludeSet(exclude, _claimed_ids))
+    _claimed_ids.update(video_ids)
+    return [YouTube(f"https://www.youtube.com/watch?v={video_id}") for video_id in video_ids]
+
+def _download_adaptive(video_stream, audio_stream, output_path, retries, label):
+    """Fetch separate video and audio streams and mux them into output_path without re-encoding."""
+    # Intermediate names avoid a .mp4 suffix so clip extraction never picks up a half-finished video
+    video_tmp = output_path.with_name(f"{output_path.stem}.video.{video_stream.subtype}.stream")
+    audio_tmp = output_path.with_name(f"{output_path.stem}.audio.{audio_stream.subtype}.stream")
+    muxed_tmp = output_path.with_name(output_path.name + ".muxing")
+    for stream, path, kind in ((video_stream, video_tmp, "video"), (audio_stream, audio_tmp, "audio")):
+        if path.exists() and path.stat().st_size == stream.filesize:
+            continue  # Finished in an earlier run that died before muxing
+        download_url(stream.url, path, expected_size=stream.filesize, retries=retries, label=f"{label} {kind}")
+    mux_streams(video_tmp, audio_tmp, muxed_tmp, output_format="mp4")
+    os.replace(muxed_tmp, output_path)
+    video_tmp.unlink()
+    audio_tmp.unlink()
 
 def download_video(yt: YouTube, category: str, retries=3):
-    """Download a YouTube video with retries and save its metadata."""
+    """Download a YouTube video with retries and save its metadata.
+
+    Streams are chosen to match the category's download profile; adaptive
+    video and audio are muxed locally. Bytes land in .part files that later
+    attempts (and later runs) resume, and the .mp4 only appears once complete,
+    so an existing file is always whole.
+    """
     video_id = yt.video_id
     filename = f"{video_id}.mp4"
     category_dir = DOWNLOAD_DIR / category
@@ -51,23 +89,32 @@ def download_video(yt: YouTube, category: str, retries=3):
         logging.info(f"⚠️ Already downloaded: {filename}")
         return None
 
-    for attempt in range(retries):
-        try:
-            stream = yt.streams.filter(file_extension='mp4', progressive=True).get_highest_resolution()
-            stream.download(output_path=str(output_path))
-            save_scraped_video(video_id)
-            save_metadata(yt, category, str(output_path))
-            logging.info(f"✅ Downloaded: {yt.title}")
-            return str(output_path)
-        except Exception as e:
-            logging.warning(f"❌ Attempt {attempt+1} failed for {yt.watch_url}: {e}")
+    try:
+        video_stream, audio_stream = select_streams(yt.streams, load_profile(category, DOWNLOAD_PROFILES))
+        logging.info(f"🎚️ {video_id}: {describe(video_stream)}" + (f" + {describe(audio_stream)}" if audio_stream else ""))
+        if audio_stream is None:
+            download_url(video_stream.url, output_path, expected_size=video_stream.filesize, retries=retries,
+                         label=video_id)
+        else:
+            _download_adaptive(video_stream, audio_stream, output_path, retries, video_id)
+    except DownloadError as e:
+        logging.error(f"⛔ {e}: {yt.watch_url}")
+        return None
+    except subprocess.CalledProcessError as e:
+        logging.error(f"⛔ Muxing failed for {yt.watch_url}: {e.stderr}")
+        return None
+    except Exception as e:
+        logging.error(f"⛔ Could not resolve a stream for {yt.watch_url}: {e}")
+        return None
 
-    logging.error(f"⛔ Giving up on download: {yt.watch_url}")
-    return None
+    save_scraped_video(video_id, category)
+    save_metadata(yt, category, str(output_path))
+    logging.info(f"✅ Downloaded: {yt.title}")
+    return str(output_path)
 
 def save_metadata(yt: YouTube, category: str, file_path: str):
-    """Save clip metadata to central metadata log."""
-    clip_data = {
+    """Record the downloaded video in the media catalog."""
+    media_catalog.add_video({
         "id": yt.video_id,
         "title": yt.title,
         "author": yt.author,
@@ -76,29 +123,24 @@ def save_metadata(yt: YouTube, category: str, file_path: str):
         "downloaded_at": datetime.utcnow().isoformat(),
         "file_path": file_path,
         "category": category
-    }
-
-    if METADATA_LOG.exists():
-        with open(METADATA_LOG, "r") as f:
-            existing = json.load(f)
-    else:
-        existing = []
+    })
 
-    existing.append(clip_data)
-
-    with open(METADATA_LOG, "w") as f:
-        json.dump(existing, f, indent=2)
-
-def scrape_category(category: str, limit=10):
+def scrape_category(category: str, limit=10, workers=DOWNLOAD_WORKERS):
     logging.info(f"🔎 Scraping category: {category}")
     scraped_ids = get_scraped_videos()
-    videos = fetch_youtube_videos(category, limit)
+    videos = fetch_youtube_videos(category, limit, exclude=scraped_ids)
 
+    pending = []
     for yt in videos:
         if yt.video_id in scraped_ids:
             logging.info(f"⏭️ Skipping duplicate: {yt.video_id}")
             continue
-        download_video(yt, category)
+        pending.append(yt)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda yt: download_video(yt, category), pending))
+    logging.info(f"📦 {category}: {sum(1 for r in results if r)}/{len(pending)} videos downloaded")
+    return [r for r in results if r]
 
 # === CLI Entrypoint ===
 if __name__ == "__main__":
@@ -106,9 +148,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--category", required=True, help="Category to scrape videos for")
     parser.add_argument("--limit", type=int, default=10, help="Number of videos to fetch")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS, help="Parallel downloads")
     args = parser.parse_args()
 
     try:
-        scrape_category(args.category, args.limit)
+        scrape_category(args.category, args.limit, args.workers)
     except Exception as e:
         logging.error(f"💥 Scraping failed: {e}")
@@ -43,6 +43,7 @@ WORKFLOW_STEPS = [
     ("Authenticate YouTube Account", "python scripts/youtube_auth.py"),
     ("Retrieve Scheduled Uploads", "python scripts/schedule_manager.py"),
     ("Scrape YouTube Data", "python scripts/youtube_scraper.py"),
+    ("Extract Clips", "python scripts/clip_extractor.py"),
     ("Process Videos", "python scripts/video_processor.py"),
     ("Generate Thumbnails", "python scripts/thumbnail_generator.py"),
     ("Upload Videos to YouTube", "python scripts/youtube_uploader.py"),